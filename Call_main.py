@@ -1,15 +1,30 @@
 # coding: utf-8
 
 import sys
-from PyQt5.QtCore import pyqtSignal, QSettings, QThread, QTimer
-from PyQt5.QtWidgets import QApplication, QFileDialog, QMainWindow, QMessageBox, QTabBar, QWidget
+from PyQt5.QtCore import pyqtSignal, QEvent, QObject, QSettings, Qt, QTimer
+from PyQt5.QtGui import QColor, QIntValidator
+from PyQt5.QtWidgets import QApplication, QFileDialog, QHeaderView, QListWidgetItem, QMainWindow, QMessageBox, QTabBar, QTableWidgetItem, QWidget
 from airflow_mainWindow import Ui_MainWindow
+from MatplotlibWidget_anim import MatplotlibWidget_anim
+from PainterWidget_anim import PainterWidget_anim
+from wind_binary import EXTENSION
+from wind_buffer import MARK_USER, WindBuffer, records_text
+from wind_cache import ParseCache
+from wind_engine import CONNECTED, DISCONNECTED, RECORD_FAILED, SEARCHING, WRONG_FORMAT, BatchQueue, WindEngine, device_name
+from wind_history import HistoryLoader, record_files
+from wind_index import TimeIndex
+from wind_metrics import export_snapshot, format_snapshot
+from wind_parser import RECORD_PATTERN
+from wind_protocol import BAUD_RATES
 
 import logging
+import multiprocessing
+import threading
 from logging.handlers import TimedRotatingFileHandler
 import traceback
 import re
 import os
+import time
 import serial
 import serial.tools.list_ports
 from datetime import datetime, timedelta
@@ -17,7 +32,7 @@ import numpy as np
 
 def setupLogger():
     # Produce formater first
-    formatter = logging.Formatter('%(asctime)s - line:%(lineno)s - %(levelname)s - %(message)s')
+    formatter = logging.Formatter('%(asctime)s - %(name)s - line:%(lineno)s - %(levelname)s - %(message)s')
     # Setup Handler
     console = logging.StreamHandler()
     console.setLevel(logging.DEBUG)
@@ -33,11 +48,29 @@ def setupLogger():
     timedfile.extMatch = re.compile(r"^\d{4}-\d{2}-\d{2}.log$")
     timedfile.setLevel(logging.DEBUG)
     timedfile.setFormatter(formatter)
-    # Setup Logger
-    logger.handlers.clear()
-    logger.addHandler(console)
-    logger.addHandler(timedfile)
+    # Setup Logger, on the root so the acquisition modules log to the same file
+    root = logging.getLogger()
+    root.handlers.clear()
+    root.addHandler(console)
+    root.addHandler(timedfile)
+    root.setLevel(logging.INFO)
     logger.setLevel(logging.DEBUG)
+    # only the problems of the libraries; a missing Calibri font is expected, matplotlib
+    # falls back to another font and warns on every text otherwise
+    for name in ('matplotlib', 'PIL', 'serial'):
+        logging.getLogger(name).setLevel(logging.WARNING)
+    logging.getLogger('matplotlib.font_manager').setLevel(logging.ERROR)
+
+STATUS_COLORS = {SEARCHING: 'blue', CONNECTED: 'green', WRONG_FORMAT: 'orange', DISCONNECTED: 'red',
+                 RECORD_FAILED: 'magenta'}
+# rows of the statistics table: label, key of RollingStats.snapshot, format
+STATS_ROWS = (('Mean (m/s)', 'mean speed', '{:.2f}'),
+              ('Std (m/s)', 'std', '{:.2f}'),
+              ('TI', 'turbulence intensity', '{:.3f}'),
+              ('Gust (m/s)', 'gust 3 s', '{:.2f}'),
+              ('Dir. (°)', 'direction', '{:.0f}'),
+              ('Elev. (°)', 'elevation', '{:.1f}'),
+              ('Samples', 'samples', '{}'))
 
 # Call the logger
 logger = logging.getLogger(__name__)
@@ -68,41 +101,22 @@ class TabBar(QTabBar):
                 hint.setHeight(averageSize)
         return hint
     
-class SerialThread(QThread):
-    signal_ser_raw = pyqtSignal(str, datetime)
-    signal_ser_empty = pyqtSignal()
-    signal_ser_status = pyqtSignal()
-    def __init__(self,myWin,parent=None):
-        super(SerialThread,self).__init__(parent)
-        self.myWin=myWin
-        self.active=False
+class EngineSignals(QObject):
+    # hand the callbacks of the reader threads over to the GUI thread
+    signal_batch = pyqtSignal(object)
+    signal_status = pyqtSignal(object, str)
+    signal_stop = pyqtSignal(object)
 
-    def run(self):
-        logger.info('Start moniroting thread')
-        #parameter setting
-        self.active=True
-        while self.active:
-            # read data from serial port
-            try:
-                raw_data = self.myWin.ser.read_until(b'\r').decode().strip().strip(b'\x00'.decode())
-                raw_time = datetime.now()
-                if not len(raw_data):
-                    self.signal_ser_empty.emit()
-                else:
-                    self.signal_ser_raw.emit(raw_data, raw_time)
-            except UnicodeDecodeError:
-                logger.error(f'{traceback.format_exc()}')
-            except Exception:
-                logger.error(f'{traceback.format_exc()}')
-                self.active=False
-                continue
-            # print(raw_time)
-            # print(raw_data)
-        logger.info('Stop moniroting thread')
-        self.signal_ser_status.emit()
-        
-    def exit(self):
-        self.active=False
+class HistorySignals(QObject):
+    # hand the callbacks of the history loader over to the GUI thread
+    signal_progress = pyqtSignal(object, object, object)
+    signal_partial = pyqtSignal(object, object, object)
+    signal_done = pyqtSignal(object)
+    signal_error = pyqtSignal(object)
+
+class SaveSignals(QObject):
+    # hand the end of a save in the background over to the GUI thread
+    signal_done = pyqtSignal(object)
 
 class MyMainWindow(QMainWindow, Ui_MainWindow):
     def __init__(self, parent=None):
@@ -140,26 +154,52 @@ class MyMainWindow(QMainWindow, Ui_MainWindow):
             self.settings.setValue('save route', './')
             self.settings.setValue('load file', './')
         # load setting
-        if self.settings.value('COM port') not in com_list:
+        # simulated sources (sim://, replay://) are kept even if no such COM port exists
+        if self.settings.value('COM port') not in com_list and '://' not in self.settings.value('COM port'):
             self.settings.setValue('COM port', self.comboBox_port.currentText())
         self.comboBox_port.setCurrentText(self.settings.value('COM port'))
         self.textEdit_saveroute.setText(self.settings.value('save route'))
         self.textEdit_loadfile.setText(self.settings.value('load file'))
+        self.comboBox_rotation.setCurrentText(self.settings.value('record rotation', 'midnight'))
+        self.comboBox_format.setCurrentText(self.settings.value('record format', 'txt'))
+        self.comboBox_baud.addItems([str(rate) for rate in BAUD_RATES])
+        self.comboBox_baud.setValidator(QIntValidator(1, 10000000, self))
+        self.comboBox_baud.setCurrentText(str(self.settings.value('baud rate', 38400, type=int)))
+        self.comboBox_frame.setCurrentText(self.settings.value('frame format', 'ascii'))
+        self.doubleSpinBox_timeout.setValue(self.settings.value('timeout', 2.0, type=float))
+        self.comboBox_live.setCurrentText(self.settings.value('live view', 'matplotlib'))
+        self.live_view_change(self.comboBox_live.currentText())
+        self.fill_more_ports(com_list)
         # variables
-        self.wind = ''
-        self.slider_time_array = np.array([])
+        self.wind = {}
+        self.display = {}
+        self.plot_port = ''
+        self.time_index = None
+        self.loader = None
+        # parsed history files, reloaded memory-mapped while they do not change
+        self.parse_cache = ParseCache(self.settings.value('cache folder', './cache/'),
+                                      self.settings.value('cache max size', 2048, type=int)*2**20)
         # connect signal
         self.push_renew.clicked.connect(self.renew_port)
         self.comboBox_port.currentTextChanged.connect(lambda: self.settings.setValue('COM port', self.comboBox_port.currentText()))
         self.push_saveroute.clicked.connect(self.saveroute_choose)
         self.textEdit_saveroute.textChanged.connect(lambda: self.settings.setValue('save route', self.textEdit_saveroute.toPlainText()))
+        self.comboBox_rotation.currentTextChanged.connect(lambda: self.settings.setValue('record rotation', self.comboBox_rotation.currentText()))
+        self.comboBox_format.currentTextChanged.connect(lambda: self.settings.setValue('record format', self.comboBox_format.currentText()))
+        self.comboBox_baud.currentTextChanged.connect(self.baud_change)
+        self.comboBox_frame.currentTextChanged.connect(lambda: self.settings.setValue('frame format', self.comboBox_frame.currentText()))
+        self.doubleSpinBox_timeout.valueChanged.connect(lambda value: self.settings.setValue('timeout', value))
+        self.comboBox_live.currentTextChanged.connect(self.live_view_change)
+        self.listWidget_ports.itemChanged.connect(lambda: self.settings.setValue('more ports', self.checked_ports()))
         self.push_start.clicked.connect(self.monitor_state)
         self.push_mark.clicked.connect(self.mark_data)
         self.push_clear.clicked.connect(self.clear_data)
         self.push_save.clicked.connect(self.save_data)
         self.push_loadfile.clicked.connect(self.load_file)
+        self.push_loadfolder.clicked.connect(self.load_folder)
         self.textEdit_loadfile.textChanged.connect(lambda: self.settings.setValue('load file', self.textEdit_loadfile.toPlainText()))
         self.push_plot_trend.clicked.connect(self.hist_trend)
+        self.push_cancel.clicked.connect(self.cancel_loading)
         self.dateTimeEdit_start.dateTimeChanged.connect(self.time_range_change)
         self.dateTimeEdit_end.dateTimeChanged.connect(self.time_range_change)
         self.checkBox_mark.stateChanged.connect(self.show_mark)
@@ -185,6 +225,32 @@ class MyMainWindow(QMainWindow, Ui_MainWindow):
             com_list.append(com[0])
         if old in com_list:
             self.comboBox_port.setCurrentText(old)
+        self.fill_more_ports(com_list)
+            
+    def fill_more_ports(self, com_list):
+        # checkable list of the ports recorded together with the shown one
+        checked = self.settings.value('more ports', [], type=list)
+        self.listWidget_ports.blockSignals(True)
+        self.listWidget_ports.clear()
+        for com in com_list:
+            item = QListWidgetItem(com)
+            item.setData(Qt.UserRole, com)
+            item.setFlags(item.flags() | Qt.ItemIsUserCheckable)
+            item.setCheckState(Qt.Checked if com in checked else Qt.Unchecked)
+            self.listWidget_ports.addItem(item)
+        self.listWidget_ports.blockSignals(False)
+        
+    def checked_ports(self):
+        ports = []
+        for i in range(self.listWidget_ports.count()):
+            item = self.listWidget_ports.item(i)
+            if item.checkState() == Qt.Checked:
+                ports.append(item.data(Qt.UserRole))
+        return ports
+            
+    def baud_change(self, text):
+        if text.isdigit() and int(text) > 0:
+            self.settings.setValue('baud rate', int(text))
             
     def saveroute_choose(self):
         folder_path = QFileDialog.getExistingDirectory(self,
@@ -198,26 +264,76 @@ class MyMainWindow(QMainWindow, Ui_MainWindow):
             self.push_start.setText("Monitoring...")
             self.lineEdit_COM.setText("searching...")
             self.lineEdit_COM.setStyleSheet("color: blue; font-size: 10pt; font-family: Calibri;")
-            # create serial, thread and timer instance
+            # one device for the shown port and one for every checked port
+            self.plot_port = self.comboBox_port.currentText()
+            ports = [self.plot_port]
+            ports += [port for port in self.checked_ports() if port not in ports]
+            folder = self.textEdit_saveroute.toPlainText()
+            options = dict(rotation=self.comboBox_rotation.currentText(),
+                           max_bytes=self.settings.value('record max size', 100, type=int)*2**20,
+                           flush_interval=self.settings.value('record flush interval', 1.0, type=float),
+                           fsync=self.settings.value('record fsync', 'rotate'),
+                           file_format=self.comboBox_format.currentText())
+            # create the engine and connect its callbacks to main window
+            self.signals = EngineSignals()
+            self.signals.signal_batch.connect(self.data_process)
+            self.signals.signal_status.connect(self.device_status)
+            self.signals.signal_stop.connect(self.change_status_text)
+            self.engine = WindEngine(on_batch=self.batch_ready,
+                                     on_status=self.signals.signal_status.emit,
+                                     on_stop=self.signals.signal_stop.emit)
+            # running statistics of the shown port over these windows (s)
+            stats_windows = [float(window) for window in self.settings.value('stats windows', [60, 600], type=list)]
+            self.setup_stats(stats_windows)
+            for port in ports:
+                device_folder = folder
+                frame_format = self.comboBox_frame.currentText()
+                if port.startswith('follow://'):
+                    # the daemon already records this port, only show its samples
+                    device_folder = None
+                    frame_format = 'ascii'
+                elif len(ports) > 1:
+                    # per-device files when several anemometers are recorded
+                    device_folder = os.path.join(folder, device_name(port))
+                buffer = self.wind.setdefault(port, WindBuffer())
+                device = self.engine.add_device(port, device_folder, buffer=buffer,
+                                                baudrate=self.settings.value('baud rate', 38400, type=int),
+                                                timeout=self.settings.value('timeout', 2.0, type=float),
+                                                frame_format=frame_format,
+                                                rate=self.settings.value('sample rate', 0, type=float) or None,
+                                                stats_windows=stats_windows if port == self.plot_port else None,
+                                                **options)
+                # the plot may drop batches when the GUI stalls, the buffer and recorder never do
+                self.display[port] = BatchQueue(self.engine.metrics, device.name)
             try:
-                self.ser=serial.Serial(self.comboBox_port.currentText(),38400,timeout=2)
-            except serial.SerialException:
+                self.engine.start()
+            except (OSError, ValueError) as e:
                 logger.error(f'{traceback.format_exc()}')
-                QMessageBox.critical(self, 'Error', 
-                                     'The access to the COM port is denied.\nPlease choose a right COM port.')
+                if isinstance(e, (serial.SerialException, ValueError)):
+                    QMessageBox.critical(self, 'Error', 
+                                         'The access to the COM port is denied.\nPlease choose a right COM port.')
+                else:
+                    QMessageBox.critical(self, 'Error', 
+                                         f'The save folder can not be created.\n{e}')
                 self.push_start.setChecked(False)
                 self.push_start.setText("Start")
                 self.lineEdit_COM.setText("disconnected")
                 self.lineEdit_COM.setStyleSheet("color: red; font-size: 10pt; font-family: Calibri;")
+                del self.engine
+                del self.signals
                 return
-            self.ser_thread = SerialThread(myWin=self)
-            # connect signal from thread to main window
-            self.ser_thread.signal_ser_raw.connect(self.data_process)
-            self.ser_thread.signal_ser_empty.connect(self.COM_empty)
-            self.ser_thread.signal_ser_status.connect(self.change_status_text)
-            # start the thread and plot
-            self.ser_thread.start()
+            self.stopped = 0
+            self.set_setting_enabled(False)
+            # start the plot
+            self.plot_anim.mpl.metrics = self.engine.metrics
+            self.plot_anim.mpl.set_frame_rate(self.settings.value('max frame rate', 10, type=float))
             self.plot_anim.mpl.toggle_pause()
+            # refresh the status panel every second and export the metrics periodically
+            self.metrics_export = time.monotonic()
+            self.timer_metrics = QTimer()
+            self.timer_metrics.timeout.connect(self.update_metrics)
+            self.timer_metrics.timeout.connect(self.update_stats)
+            self.timer_metrics.start(1000)
             # calculate the delta time and start the single shot timer
             time1 = datetime.now()
             # time2 = time1+timedelta(minutes=1)
@@ -230,70 +346,119 @@ class MyMainWindow(QMainWindow, Ui_MainWindow):
             self.timer_midnight.timeout.connect(self.save_midnight)
             self.timer_midnight.start(round(delta.total_seconds()*1000))
         else:
-            self.ser_thread.exit()
-            # # end monitoring
-            # self.push_start.setText("Start")
-            # try:
-            #     # stop the thread and timer
-            #     self.timer_midnight.stop()
-            #     self.plot_anim.mpl.toggle_pause()
-            #     self.ser_thread.exit()
-            #     self.ser.close()
-            #     # delete the serial, thread and timer instance
-            #     del self.ser_thread
-            #     del self.ser
-            #     del self.timer_midnight
-            # except Exception:
-            #     logger.error(f'{traceback.format_exc()}')
+            self.engine.stop(wait=False)
             
-    def data_process(self, raw, time):
-        result_raw = re.match('((\s+)?(-)?\d+\.\d){7}$', raw)
-        if result_raw:
-            self.lineEdit_COM.setText("connected")
-            self.lineEdit_COM.setStyleSheet("color: green; font-size: 10pt; font-family: Calibri;")
-            data = [float(n) for n in raw.split()]
-        else:
-            self.lineEdit_COM.setText("wrong format")
-            self.lineEdit_COM.setStyleSheet("color: orange; font-size: 10pt; font-family: Calibri;")
-            logger.warning(f'Data format from serial port is wrong. Raw string: {raw}')
+    def set_setting_enabled(self, enabled):
+        self.comboBox_port.setEnabled(enabled)
+        self.listWidget_ports.setEnabled(enabled)
+        self.comboBox_rotation.setEnabled(enabled)
+        self.comboBox_format.setEnabled(enabled)
+        self.comboBox_baud.setEnabled(enabled)
+        self.comboBox_frame.setEnabled(enabled)
+        self.doubleSpinBox_timeout.setEnabled(enabled)
+        self.comboBox_live.setEnabled(enabled)
+
+    def live_view_change(self, text):
+        # matplotlib or the lighter QPainter view, swapped in place of the live plot
+        self.settings.setValue('live view', text)
+        if isinstance(self.plot_anim, PainterWidget_anim) != (text == 'qpainter'):
+            widget = PainterWidget_anim(self.tab) if text == 'qpainter' else MatplotlibWidget_anim(self.tab)
+            self.horizontalLayout.replaceWidget(self.plot_anim, widget)
+            self.plot_anim.deleteLater()
+            self.plot_anim = widget
+        self.plot_anim.comboBox_window.setCurrentText(self.settings.value('live window', '1 min'))
+        self.plot_anim.comboBox_window.currentTextChanged.connect(lambda text: self.settings.setValue('live window', text))
+            
+    def batch_ready(self, device, times, data, read_time):
+        # called in the reader thread, only one wake-up of the GUI thread is pending per device
+        if device.port == self.plot_port and self.display[device.port].put(times, data, read_time):
+            self.signals.signal_batch.emit(device)
+        
+    def data_process(self, device):
+        start = time.monotonic()
+        batches = self.display[device.port].take()
+        if not batches:
             return
-        raw = re.sub('\s+', ',', raw)
-        result_raw = re.match(',', raw)
-        if not result_raw:
-            raw = ','+raw
-        self.wind = self.wind+time.strftime('%Y-%m-%d %H:%M:%S.%f')+raw+',0\n'
-        self.plot_anim.mpl.update_line_data(time, data[0], data[1], data[2], 
-                                            data[3], data[4], data[5])
+        # coalesce the waiting batches, the plot only shows the newest samples
+        times = np.concatenate([batch[0] for batch in batches])
+        data = np.concatenate([batch[1] for batch in batches])
+        self.plot_anim.mpl.update_batch(times, data)
+        for batch in batches:
+            self.plot_anim.mpl.batch_read(batch[2])
+        device.metrics.observe('gui update', time.monotonic()-start)
         
-    def COM_empty(self):
-        if self.push_start.isChecked():
-            self.lineEdit_COM.setText("searching...")
-            self.lineEdit_COM.setStyleSheet("color: blue; font-size: 10pt; font-family: Calibri;")
-            logger.warning(f'{self.comboBox_port.currentText()} is empty.')
+    def update_metrics(self):
+        self.plainTextEdit_metrics.setPlainText(format_snapshot(self.engine.metrics.snapshot()))
+        interval = self.settings.value('metrics interval', 10, type=float)
+        if interval > 0 and time.monotonic()-self.metrics_export >= interval:
+            self.metrics_export = time.monotonic()
+            try:
+                export_snapshot('./log/', self.engine.metrics.snapshot('file'))
+            except OSError:
+                logger.error(f'{traceback.format_exc()}')
+        
+    def setup_stats(self, windows):
+        self.tableWidget_stats.clear()
+        self.tableWidget_stats.setRowCount(len(STATS_ROWS))
+        self.tableWidget_stats.setColumnCount(len(windows))
+        self.tableWidget_stats.setVerticalHeaderLabels([label for label, key, form in STATS_ROWS])
+        self.tableWidget_stats.setHorizontalHeaderLabels([f'{window/60:g} min' if window % 60 == 0 else f'{window:g} s'
+                                                         for window in windows])
+        self.tableWidget_stats.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+
+    def update_stats(self):
+        device = self.engine.device(self.plot_port)
+        if device is None or device.stats is None:
+            return
+        for column, stats in enumerate(device.stats.snapshot().values()):
+            for row, (label, key, form) in enumerate(STATS_ROWS):
+                text = '-' if stats is None else form.format(stats[key])
+                self.tableWidget_stats.setItem(row, column, QTableWidgetItem(text))
+
+    def device_status(self, device, status):
+        color = STATUS_COLORS[status]
+        if device.port == self.plot_port:
+            self.lineEdit_COM.setText(status)
+            self.lineEdit_COM.setStyleSheet(f"color: {color}; font-size: 10pt; font-family: Calibri;")
+        for i in range(self.listWidget_ports.count()):
+            item = self.listWidget_ports.item(i)
+            if item.data(Qt.UserRole) == device.port:
+                item.setText(f'{device.port}: {status}')
+                item.setForeground(QColor(color))
             
-    def change_status_text(self):
+    def change_status_text(self, device):
+        # wait until every device has stopped
+        self.stopped += 1
+        if self.stopped < len(self.engine.devices):
+            return
         self.push_start.setChecked(False)
         self.lineEdit_COM.setText("disconnected")
         self.lineEdit_COM.setStyleSheet("color: red; font-size: 10pt; font-family: Calibri;")
         # end monitoring
         self.push_start.setText("Start")
-        # stop the thread and timer
+        self.set_setting_enabled(True)
+        # stop the timer and plot
         self.timer_midnight.stop()
+        self.timer_metrics.stop()
+        self.update_metrics()
+        self.update_stats()
         self.plot_anim.mpl.toggle_pause()
-        # self.ser_thread.exit()
-        self.ser.close()
-        # delete the serial, thread and timer instance
-        del self.ser_thread
-        del self.ser
+        self.plot_anim.mpl.metrics = None
+        # delete the engine and timer instance
+        del self.engine
+        del self.signals
         del self.timer_midnight
+        del self.timer_metrics
         
     def mark_data(self):
         if self.push_start.isChecked():
             self.plot_anim.mpl.mark_data()
-            self.wind = re.sub('0\n$', '1\n', self.wind)
+            self.engine.mark_last()
     
     def clear_data(self):
-        self.wind = ''
+        for buffer in self.wind.values():
+            with buffer.lock:
+                buffer.clear()
         self.plot_anim.mpl.plot_clear()
         
     def save_data(self):
@@ -303,8 +468,41 @@ class MyMainWindow(QMainWindow, Ui_MainWindow):
                                            fileName,
                                            "Text files (*.txt)")
         if name[0]:
-            with open(name[0],'w') as f:
-                f.write(self.wind)
+            # the shown device goes to the chosen file, the others get their port as suffix
+            root, ext = os.path.splitext(name[0])
+            files = []
+            for port, buffer in self.wind.items():
+                fileName = name[0]
+                if port != self.plot_port:
+                    fileName = f'{root}_{device_name(port)}{ext}'
+                # only copy under the lock, the readers keep draining their ports
+                with buffer.lock:
+                    files.append((fileName, buffer.arrays()))
+            # a whole day takes seconds to format, done in the background
+            self.save_signals = SaveSignals()
+            self.save_signals.signal_done.connect(self.save_done)
+            self.push_save.setEnabled(False)
+            threading.Thread(target=self.write_saved, args=(files, self.save_signals.signal_done.emit),
+                             name='save', daemon=True).start()
+                
+    def write_saved(self, files, on_done):
+        # in the save thread: write every file, then report the error if any
+        try:
+            for fileName, columns in files:
+                text = records_text(*columns)
+                with open(fileName,'w') as f:
+                    f.write(text)
+        except OSError as e:
+            logger.error(f'Save failed: {e!r}')
+            on_done(e)
+        else:
+            on_done(None)
+            
+    def save_done(self, error):
+        self.push_save.setEnabled(True)
+        if error is not None:
+            QMessageBox.critical(self, 'Error', 
+                                 f'The file can not be saved.\n{error}')
                 
     def save_midnight(self):
         # save daily data
@@ -315,13 +513,11 @@ class MyMainWindow(QMainWindow, Ui_MainWindow):
         # self.wind = split_time+wind_split[1]
         # with open(fileName,'w') as f:
         #     f.write(wind_split[0])
-        fileTime = datetime.now()-timedelta(days=1)
-        fileName = os.path.join(self.textEdit_saveroute.toPlainText(),fileTime.strftime('%y%m%d')+'.txt')
-        split_time = datetime.now().strftime('%Y-%m-%d')
-        wind_split = re.split(split_time, self.wind, 1)
-        self.wind = split_time+wind_split[1]
-        with open(fileName,'w') as f:
-            f.write(wind_split[0])
+        # the daily files are already written by the recorders, only drop yesterday from memory
+        split_time = np.datetime64(datetime.now().date(), 'ns').astype(np.int64)
+        for buffer in self.wind.values():
+            with buffer.lock:
+                buffer.discard_before(split_time)
         # set the next timer
         time1 = datetime.now()
         # time2 = time1+timedelta(minutes=1)
@@ -337,53 +533,150 @@ class MyMainWindow(QMainWindow, Ui_MainWindow):
     def load_file(self):
         name = QFileDialog.getOpenFileName(self, 'Load History Data',
                                            self.textEdit_loadfile.toPlainText(),
-                                           "Text files (*.txt)")
+                                           "Text files (*.txt);;Binary files (*.afb)")
         if name[0]:
             self.textEdit_loadfile.setText(name[0])
             
+    def load_folder(self):
+        folder = QFileDialog.getExistingDirectory(self, 'Load History Folder',
+                                                  self.textEdit_loadfile.toPlainText())
+        if folder:
+            self.textEdit_loadfile.setText(folder)
+            # the whole folder by default
+            files = record_files(folder)
+            if files:
+                self.dateEdit_from.setDate(files[0][0])
+                self.dateEdit_to.setDate(files[-1][0])
+            
     def hist_trend(self):
-        try:
-            with open(self.textEdit_loadfile.toPlainText()) as f:
-                # if the file is for 3D anemometer
-                test = f.readline()
-                result_raw = re.match('\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}\.\d{6}(,(-)?\d+\.\d+){7}(,\d)$', test)
-                if not result_raw:
-                    QMessageBox.critical(self, 'Error', 
-                                         'The format of content is wrong.')
-                    return
-                # read the left content
-                text = f.read().rstrip()
-        except FileNotFoundError:
+        if self.loader is not None:
+            return
+        path = self.textEdit_loadfile.toPlainText()
+        if os.path.isdir(path):
+            # every recorded file of the day range, the text files parsed in parallel
+            files = record_files(path, self.dateEdit_from.date().toPyDate(), self.dateEdit_to.date().toPyDate())
+            if not files:
+                QMessageBox.critical(self, 'Error', 
+                                     'There is no recorded file in the date range.')
+                return
+            paths = [file_path for day, file_path in files]
+        else:
+            try:
+                if not path.endswith(EXTENSION):
+                    with open(path) as f:
+                        # if the file is for 3D anemometer
+                        test = f.readline()
+                    if not RECORD_PATTERN.fullmatch(test):
+                        QMessageBox.critical(self, 'Error', 
+                                             'The format of content is wrong.')
+                        return
+                elif not os.path.exists(path):
+                    raise FileNotFoundError(path)
+            except FileNotFoundError:
+                QMessageBox.critical(self, 'Error', 
+                                     'Can not find the file.')
+                return
+            paths = [path]
+        # parse in the background, the window keeps responding and the load can be cancelled
+        self.history_signals = HistorySignals()
+        self.history_signals.signal_progress.connect(self.load_progress)
+        self.history_signals.signal_partial.connect(self.load_partial)
+        self.history_signals.signal_done.connect(self.load_done)
+        self.history_signals.signal_error.connect(self.load_error)
+        self.loader = HistoryLoader(paths, self.parse_cache, self.settings.value('load workers', 0, type=int) or None,
+                                    on_progress=self.history_signals.signal_progress.emit,
+                                    on_partial=self.history_signals.signal_partial.emit,
+                                    on_done=self.history_signals.signal_done.emit,
+                                    on_error=self.history_signals.signal_error.emit)
+        self.push_plot_trend.setEnabled(False)
+        self.push_cancel.setEnabled(True)
+        self.progressBar_load.setValue(0)
+        self.progressBar_load.setFormat('Loading...')
+        self.loader.start()
+        
+    def load_progress(self, done_bytes, total_bytes, lines):
+        self.progressBar_load.setValue(int(done_bytes/max(total_bytes, 1)*self.progressBar_load.maximum()))
+        self.progressBar_load.setFormat(f'{done_bytes/2**20:.0f} / {total_bytes/2**20:.0f} MB, {lines} lines')
+        
+    def load_partial(self, times, data, marks):
+        # a long load is shown as it goes
+        if len(times):
+            self.set_history(times, data, marks)
+        
+    def load_done(self, result):
+        self.finish_loading()
+        times, data, marks, bad = result
+        self.progressBar_load.setValue(self.progressBar_load.maximum())
+        self.progressBar_load.setFormat(f'{len(times)} samples')
+        self.warn_bad_lines(bad)
+        self.set_history(times, data, marks)
+        
+    def load_error(self, error):
+        self.finish_loading()
+        self.progressBar_load.setFormat('')
+        if isinstance(error, FileNotFoundError):
             QMessageBox.critical(self, 'Error', 
                                  'Can not find the file.')
-            self.push_run.setChecked(False)
+        else:
+            logger.error(f'{error!r}')
+            QMessageBox.critical(self, 'Error', 
+                                 'The format of content is wrong.')
+        
+    def cancel_loading(self):
+        if self.loader is None:
+            return
+        # the files being parsed may still finish, their results are not shown
+        self.loader.cancel()
+        self.history_signals.blockSignals(True)
+        self.finish_loading()
+        self.progressBar_load.setFormat('Cancelled')
+        
+    def finish_loading(self):
+        self.loader = None
+        self.push_plot_trend.setEnabled(True)
+        self.push_cancel.setEnabled(False)
+        
+    def warn_bad_lines(self, bad):
+        # skipped lines per file
+        if not bad:
             return
-        # get variables
-        text_list = re.split('[,\n]', text)
-        hist_wind = np.array(text_list).reshape((-1,9))
-        self.hist_time = hist_wind[:,0].astype('datetime64')
-        self.hist_d2 = hist_wind[:,4].astype('float')
-        self.hist_mag = hist_wind[:,5].astype('float')
-        self.hist_az = hist_wind[:,6].astype('float')
-        self.hist_el = hist_wind[:,7].astype('float')
-        hist_mark = hist_wind[:,8].astype('bool')
+        text = []
+        for path, lines in bad.items():
+            numbers = ', '.join(str(line) for line in lines[:10])+(', ...' if len(lines) > 10 else '')
+            logger.warning(f'{len(lines)} wrong lines skipped in {path}: {numbers}')
+            text.append(f'{os.path.basename(path)}: {len(lines)} lines ({numbers})')
+        QMessageBox.warning(self, 'Warning', 
+                            'Lines with a wrong format are skipped.\n'+'\n'.join(text[:10]))
+        
+    def set_history(self, times, data, marks):
+        if not times.size:
+            QMessageBox.critical(self, 'Error', 
+                                 'The file is empty.')
+            return
+        self.hist_time = times.astype('datetime64[ns]').astype('datetime64[us]')
+        self.hist_d2 = data[:,3]
+        self.hist_mag = data[:,4]
+        self.hist_az = data[:,5]
+        self.hist_el = data[:,6]
+        self.plot_history((marks & MARK_USER) != 0)
+        
+    def plot_history(self, hist_mark):
         self.plot_trend.mpl.plot_trend(self.hist_time, self.hist_mag, 
                                        self.hist_az, self.hist_el, hist_mark)
         # set start and end time
         self.dateTimeEdit_start.setDateTime(self.hist_time[0].tolist())
         self.dateTimeEdit_end.setDateTime(self.hist_time[-1].tolist())
         # set pointer slider
-        self.slider_time_array = np.arange(np.datetime64(self.hist_time[0], 's'), self.hist_time[-1], 
-                                           np.timedelta64(1,'s'), dtype='datetime64')
-        self.horizontalSlider_moment.setRange(0,self.slider_time_array.size-1)
+        self.time_index = TimeIndex(self.hist_time)
+        self.horizontalSlider_moment.setRange(0,self.time_index.size-1)
         self.horizontalSlider_moment.setValue(0)
-        self.dateTimeEdit_moment.setDateTime(self.slider_time_array[0].tolist())
+        self.dateTimeEdit_moment.setDateTime(self.time_index.first.tolist())
         # set range slider
-        self.horizontalSlider_period.setRange(0, self.slider_time_array.size-1)
-        self.horizontalSlider_period.setValue([0,self.slider_time_array.size-1])
+        self.horizontalSlider_period.setRange(0, self.time_index.size-1)
+        self.horizontalSlider_period.setValue([0,self.time_index.size-1])
         
     def time_range_change(self):
-        if self.slider_time_array.size > 0:
+        if self.time_index is not None:
             start = self.dateTimeEdit_start.dateTime().toString('yyyy-MM-dd HH:mm:ss')
             start = np.array(start, dtype='datetime64')
             end = self.dateTimeEdit_end.dateTime().toString('yyyy-MM-dd HH:mm:ss')
@@ -398,12 +691,11 @@ class MyMainWindow(QMainWindow, Ui_MainWindow):
             # adjust trend chart range
             self.plot_trend.mpl.change_time_range(start, end)
             # adjust pointer slider
-            self.slider_time_array = np.arange(start, end+np.timedelta64(1,'s'), 
-                                               np.timedelta64(1,'s'), dtype='datetime64')
-            self.horizontalSlider_moment.setRange(0,self.slider_time_array.size-1)
+            self.time_index = TimeIndex(self.hist_time, start, end)
+            self.horizontalSlider_moment.setRange(0,self.time_index.size-1)
             self.edit_pointer_change(self.dateTimeEdit_moment.dateTime())
             # adjust range slider
-            self.horizontalSlider_period.setRange(0, self.slider_time_array.size-1)
+            self.horizontalSlider_period.setRange(0, self.time_index.size-1)
             self.edit_period_change()
             
         
@@ -432,26 +724,24 @@ class MyMainWindow(QMainWindow, Ui_MainWindow):
                 self.plot_compass.mpl.hide_period_compass()
             
     def edit_pointer_change(self, pointer_time):
-        if self.slider_time_array.size > 0:
+        if self.time_index is not None:
             pointer_time = pointer_time.toString('yyyy-MM-dd HH:mm:ss')
             pointer_time = np.array(pointer_time, dtype='datetime64')
-            if pointer_time < self.slider_time_array[0]:
-                self.dateTimeEdit_moment.setDateTime(self.slider_time_array[0].tolist())
+            if pointer_time < self.time_index.first:
+                self.dateTimeEdit_moment.setDateTime(self.time_index.first.tolist())
                 return
-            elif pointer_time > self.slider_time_array[-1]:
-                self.dateTimeEdit_moment.setDateTime(self.slider_time_array[-1].tolist())
+            elif pointer_time > self.time_index.last:
+                self.dateTimeEdit_moment.setDateTime(self.time_index.last.tolist())
                 return
-            ind = np.where(self.slider_time_array==pointer_time)
-            self.horizontalSlider_moment.setValue(ind[0][0])
+            self.horizontalSlider_moment.setValue(self.time_index.position(pointer_time))
         
     def slider_pointer_change(self, ind):
-        if self.slider_time_array.size > 0:
-            pointer_time = self.slider_time_array[ind]
+        if self.time_index is not None:
+            pointer_time = self.time_index.time(ind)
             self.dateTimeEdit_moment.setDateTime(pointer_time.tolist())
             if self.radioButton_moment.isChecked():
                 self.plot_trend.mpl.move_pointer(pointer_time)
-                deltas = np.absolute(self.hist_time - pointer_time)
-                target_ind = np.argmin(deltas)
+                target_ind = self.time_index.nearest(pointer_time)
                 target_d2 = self.hist_d2[target_ind]
                 target_mag = self.hist_mag[target_ind]
                 target_az = self.hist_az[target_ind]
@@ -460,18 +750,18 @@ class MyMainWindow(QMainWindow, Ui_MainWindow):
                                                           target_az, target_el)
             
     def edit_period_change(self):
-        if self.slider_time_array.size > 0:
+        if self.time_index is not None:
             position_time1 = self.dateTimeEdit_period_start.dateTime().toString('yyyy-MM-dd HH:mm:ss')
             position_time1 = np.array(position_time1, dtype='datetime64')
             position_time2 = self.dateTimeEdit_period_end.dateTime().toString('yyyy-MM-dd HH:mm:ss')
             position_time2 = np.array(position_time2, dtype='datetime64')
-            position_ind1 = np.where(self.slider_time_array==position_time1)
-            position_ind2 = np.where(self.slider_time_array==position_time2)
-            if position_ind1[0].size == 0:
-                self.dateTimeEdit_period_start.setDateTime(self.slider_time_array[0].tolist())
+            position_ind1 = self.time_index.position(position_time1)
+            position_ind2 = self.time_index.position(position_time2)
+            if position_ind1 is None:
+                self.dateTimeEdit_period_start.setDateTime(self.time_index.first.tolist())
                 return
-            if position_ind2[0].size == 0:
-                self.dateTimeEdit_period_end.setDateTime(self.slider_time_array[-1].tolist())
+            if position_ind2 is None:
+                self.dateTimeEdit_period_end.setDateTime(self.time_index.last.tolist())
                 return
             if position_time1 >= position_time2:
                 self.dateTimeEdit_period_start.setStyleSheet("color: red; font-size: 10pt; font-family: Calibri;")
@@ -479,24 +769,22 @@ class MyMainWindow(QMainWindow, Ui_MainWindow):
                 return
             self.dateTimeEdit_period_start.setStyleSheet("color: black; font-size: 10pt; font-family: Calibri;")
             self.dateTimeEdit_period_end.setStyleSheet("color: black; font-size: 10pt; font-family: Calibri;")
-            self.horizontalSlider_period.setValue([position_ind1[0][0], position_ind2[0][0]])
+            self.horizontalSlider_period.setValue([position_ind1, position_ind2])
             
     def slider_period_change(self, ind):
-        if self.slider_time_array.size > 0:
-            position_time1 = self.slider_time_array[ind[0]]
-            position_time2 = self.slider_time_array[ind[1]]
+        if self.time_index is not None:
+            position_time1 = self.time_index.time(ind[0])
+            position_time2 = self.time_index.time(ind[1])
             self.dateTimeEdit_period_start.setDateTime(position_time1.tolist())
             self.dateTimeEdit_period_end.setDateTime(position_time2.tolist())
             if self.radioButton_period.isChecked():
                 self.plot_trend.mpl.move_span(position_time1, position_time2)
         
     def period_compass(self):
-        if self.slider_time_array.size > 0 & self.radioButton_period.isChecked():
+        if self.time_index is not None and self.radioButton_period.isChecked():
             period_ind = self.horizontalSlider_period.value()
-            deltas = np.absolute(self.hist_time - self.slider_time_array[period_ind[0]])
-            target_ind1 = np.argmin(deltas)
-            deltas = np.absolute(self.hist_time - self.slider_time_array[period_ind[1]])
-            target_ind2 = np.argmin(deltas)
+            target_ind1 = self.time_index.nearest(self.time_index.time(period_ind[0]))
+            target_ind2 = self.time_index.nearest(self.time_index.time(period_ind[1]))
             target_d2 = self.hist_d2[target_ind1:target_ind2]
             target_mag = self.hist_mag[target_ind1:target_ind2]
             target_az = self.hist_az[target_ind1:target_ind2]
@@ -507,16 +795,26 @@ class MyMainWindow(QMainWindow, Ui_MainWindow):
     def compass_radius_change(self, r):
         self.plot_compass.mpl.radius_change(r)
         
+    def changeEvent(self, event):
+        super().changeEvent(event)
+        # the live plot skips frames while minimized, catch up when restored
+        if event.type() == QEvent.WindowStateChange:
+            self.plot_anim.mpl.schedule()
+
     def closeEvent(self, event):
+        self.cancel_loading()
         if self.push_start.isChecked():
             self.push_start.setChecked(False)
-            self.monitor_state()
+            # wait for the readers so the recorders close their files
+            self.engine.stop()
         # clear handlers of logger and shutdown logger
         logger.debug('End of application: Air Flow Monitor')
-        logger.handlers.clear()
+        logging.getLogger().handlers.clear()
         logging.shutdown()
 
 if __name__=="__main__":  
+    # the history loader starts worker processes, which run this file again when frozen
+    multiprocessing.freeze_support()
     app = QApplication(sys.argv)  
     myWin = MyMainWindow()  
     myWin.show()  
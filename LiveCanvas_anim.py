@@ -0,0 +1,176 @@
+import math
+import time
+import numpy as np
+from PyQt5.QtCore import QTimer
+from wind_decimate import CascadeRing, LIVE_BUCKETS, LIVE_WINDOWS
+
+
+class LiveCanvas:
+    """Live model and redraw scheduler shared by the live views.
+
+    It keeps the speed and azimuth of the samples as min/max buckets of every window, the
+    newest and the marked samples, and schedules a frame when data arrives, at most max_fps
+    per second and only while the canvas is shown. A view mixes it in before its widget
+    class, calls init_live once its widget is set up and provides:
+    render(), to draw a frame now; refresh(), to show a change while paused; and optionally
+    pause_changed(). Times are shown in units of x_seconds, converted by to_x.
+    """
+
+    # seconds per unit of the time axis
+    x_seconds = 1
+
+    def init_live(self):
+        # Store speed and azimuth as min/max per bucket, one level per window
+        self.cascade = CascadeRing([seconds*10**9//LIVE_BUCKETS for name, seconds in LIVE_WINDOWS], 2)
+        self.level = 0
+        self.time_window = LIVE_WINDOWS[0][1]/self.x_seconds
+        self.relimit = False
+        # newest and marked samples: time, speed, azimuth
+        self.last = None
+        self.marks = np.empty((0, 3))
+        self.x = np.empty(0)
+        self.mag = np.empty(0)
+        self.az = np.empty(0)
+        self.mark = self.marks
+        self.u = 0
+        self.v = 0
+        self.w = 0
+        self.r = 0
+        self.theta = 0
+        # monotonic read times of the batches not drawn yet, for the read to plot latency
+        self.metrics = None
+        self.read_times = []
+
+        # Redraw loop
+        self.dirty = False
+        self.max_fps = 10
+        self.last_frame = 0
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(self.animate)
+        self.paused = True
+
+    def to_x(self, times):
+        # int64 ns to the time axis
+        return times/(self.x_seconds*1e9)
+
+    def window_view(self):
+        # min/max envelope of the window, two points per bucket, and the visible marks
+        if self.last is None:
+            return np.empty(0), np.empty(0), np.empty(0), self.marks
+        width = self.cascade.widths[self.level]
+        start = self.last_time-int(self.time_window*self.x_seconds*1e9)-width
+        times, mins, maxs, means = self.cascade.buckets(self.level, start)
+        x = np.repeat(self.to_x(times+width//2), 2)
+        mag = np.column_stack([mins[:, 0], maxs[:, 0]]).ravel()
+        az = np.column_stack([mins[:, 1], maxs[:, 1]]).ravel()
+        mark = self.marks[self.marks[:, 0] >= x[0]] if x.size else self.marks[:0]
+        return x, mag, az, mark
+
+    def update_view(self):
+        self.x, self.mag, self.az, self.mark = self.window_view()
+
+    def next_limits(self, xlim, ylim):
+        # page the time axis and rescale the speed axis with some hysteresis, so the limits
+        # stay the same for many frames
+        if not self.x.size:
+            return xlim, ylim
+        last = self.x[-1]
+        xmin, xmax = xlim
+        if self.relimit or last > xmax or last < xmax-self.time_window:
+            self.relimit = False
+            xmax = last+self.time_window/10
+            xlim = (xmax-self.time_window, xmax)
+        visible = self.mag[(self.x >= xlim[0]) & np.isfinite(self.mag)]
+        if visible.size:
+            low, high = visible.min(), visible.max()
+            span = max(high-low, 0.1)
+            ymin, ymax = ylim
+            if low < ymin or high > ymax or span < 0.4*(ymax-ymin):
+                middle = (low+high)/2
+                ylim = (middle-0.6*span, middle+0.6*span)
+        return xlim, ylim
+
+    def shown(self):
+        # hidden behind another tab or minimized
+        return self.isVisible() and not self.window().isMinimized()
+
+    def schedule(self):
+        if self.paused or not self.dirty or self.timer.isActive() or not self.shown():
+            return
+        delay = self.last_frame+1/self.max_fps-time.monotonic()
+        self.timer.start(max(0, int(delay*1000)))
+
+    def set_frame_rate(self, fps):
+        self.max_fps = max(fps, 0.1)
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        self.schedule()
+
+    def animate(self):
+        if not self.dirty or not self.shown():
+            return
+        start = time.monotonic()
+        self.last_frame = start
+        self.dirty = False
+        self.render()
+        if self.metrics is not None:
+            end = time.monotonic()
+            self.metrics.observe('redraw', end-start)
+            for read_time in self.read_times:
+                self.metrics.observe('read to plot', end-read_time)
+        self.read_times = []
+
+    def update_batch(self, times, data):
+        # times in int64 ns, data with u, v, w, d2, mag, az, el
+        if not len(times):
+            return
+        self.cascade.add(times, data[:, 4:6])
+        self.last_time = int(times[-1])
+        self.last = np.array([self.to_x(times[-1:])[0], data[-1, 4], data[-1, 5]])
+        self.u, self.v, self.w, self.r = data[-1, :4]
+        self.theta = math.radians(data[-1, 5])
+        self.dirty = True
+        self.schedule()
+
+    def batch_read(self, read_time):
+        self.read_times.append(read_time)
+
+    def mark_data(self):
+        if self.last is not None:
+            # keep the marks of the longest window
+            self.marks = np.vstack([self.marks[self.marks[:, 0] >= self.last[0]-LIVE_WINDOWS[-1][1]/self.x_seconds],
+                                    self.last])
+            self.dirty = True
+            self.schedule()
+
+    def set_window(self, index):
+        self.level = index
+        self.time_window = LIVE_WINDOWS[index][1]/self.x_seconds
+        self.relimit = True
+        self.dirty = True
+        if self.paused:
+            self.refresh()
+        else:
+            self.schedule()
+
+    def pause_changed(self):
+        pass
+
+    def toggle_pause(self, *args, **kwargs):
+        self.timer.stop()
+        self.paused = not self.paused
+        self.pause_changed()
+        self.schedule()
+
+    def plot_clear(self):
+        self.cascade.clear()
+        self.last = None
+        self.marks = np.empty((0, 3))
+        self.u = 0
+        self.v = 0
+        self.w = 0
+        self.r = 0
+        self.theta = 0
+        self.refresh()
@@ -3,21 +3,40 @@ import matplotlib
 
 matplotlib.use("Qt5Agg")
 from PyQt5.QtCore import QSize
-from PyQt5.QtWidgets import QApplication, QVBoxLayout, QSizePolicy, QWidget
+from PyQt5.QtWidgets import QApplication, QComboBox, QHBoxLayout, QLabel, QVBoxLayout, QSizePolicy, QWidget
 # from PyQt5.QtWidgets import QVBoxLayout, QSizePolicy, QWidget
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
 from matplotlib.backends.backend_qt5agg import NavigationToolbar2QT as NavigationToolbar
 from matplotlib.figure import Figure
 
-import matplotlib.animation as animation
 import matplotlib.dates as mdates
-from datetime import datetime, timedelta
 import numpy as np
 import math
+from LiveCanvas_anim import LiveCanvas
+from wind_decimate import LIVE_WINDOWS
 
-class MyMplCanvas(FigureCanvas):
+def arrow_segments(u, v, w, ratio=0.3, angle=15):
+    # shaft and the two head lines of a 3D arrow from the origin, as drawn by Axes3D.quiver
+    tip = np.array([u, v, w], dtype=float)
+    norm = math.hypot(u, v)
+    # rotate the arrow around the horizontal axis perpendicular to it
+    x_p, y_p = (v/norm, -u/norm) if norm else (0.0, 1.0)
+    c = math.cos(math.radians(angle))
+    s = math.sin(math.radians(angle))
+    heads = []
+    for sign in (1, -1):
+        rotation = np.array([[c+x_p**2*(1-c), x_p*y_p*(1-c), sign*y_p*s],
+                             [x_p*y_p*(1-c), c+y_p**2*(1-c), -sign*x_p*s],
+                             [-sign*y_p*s, sign*x_p*s, c]])
+        heads.append([tip, tip-ratio*rotation.dot(tip)])
+    return [[tip, np.zeros(3)]]+heads
+
+class MyMplCanvas(LiveCanvas, FigureCanvas):
     """FigureCanvas的最終的父類其實是QWidget。"""
 
+    # the time axis is in matplotlib date numbers (days)
+    x_seconds = 86400
+
     def __init__(self, parent=None):
         # Set the default font
         font = {'family' : 'Calibri',
@@ -42,28 +61,18 @@ class MyMplCanvas(FigureCanvas):
                                    QSizePolicy.Expanding)
         # FigureCanvas.updateGeometry(self)
         
-        # Store x and y
-        self.x = np.empty(610, dtype='O')
-        self.x.fill(datetime(2000,1,1,0,0,0))
-        self.mag = np.empty(610)
-        self.mag.fill(np.nan)
-        self.az = np.empty(610)
-        self.az.fill(np.nan)
-        self.u = 0
-        self.v = 0
-        self.w = 0
-        self.r = 0
-        self.theta = 0
-        self.mark = np.array([], dtype='int')
+        # live model and redraw scheduler
+        self.init_live()
         
         # Store a figure and ax
         self.line_1, = self.ax_1.plot(self.x, self.mag, zorder=1)
-        self.sca_1 = self.ax_1.scatter(self.x[self.mark], self.mag[self.mark], facecolors='none', edgecolors='r', zorder=2)
+        self.sca_1 = self.ax_1.scatter(self.mark[:, 0], self.mark[:, 1], facecolors='none', edgecolors='r', zorder=2)
         self.ax_1.grid(True)
         self.ax_1.set_title('Wind speed', fontsize=12)
         self.ax_1.set_xlabel('Time')
         self.ax_1.set_ylabel('Wind speed (m/s)')
         self.ax_1.tick_params(axis='x', labelrotation = 30)
+        self.ax_1.xaxis_date()
         self.ax_1.xaxis.set_major_formatter(mdates.DateFormatter('%H:%M:%S'))
         
         self.line_2 = self.ax_2.quiver(0,0,0,0,0,0, color="#28502E")
@@ -77,7 +86,7 @@ class MyMplCanvas(FigureCanvas):
         
         
         self.line_3, = self.ax_3.plot(self.x, self.az, color="#F6BA42", zorder=1)
-        self.sca_2 = self.ax_3.scatter(self.x[self.mark], self.az[self.mark], facecolors='none', edgecolors='r', zorder=2)
+        self.sca_2 = self.ax_3.scatter(self.mark[:, 0], self.mark[:, 2], facecolors='none', edgecolors='r', zorder=2)
         self.ax_3.grid(True)
         self.ax_3.set_title('Wind azimuth', fontsize=12)
         self.ax_3.set_xlabel('Time')
@@ -85,6 +94,7 @@ class MyMplCanvas(FigureCanvas):
         self.ax_3.set_ylim(ymin=0, ymax=360)
         self.ax_3.set_yticks([0,90,180,270,360])
         self.ax_3.tick_params(axis='x', labelrotation = 30)
+        self.ax_3.xaxis_date()
         self.ax_3.xaxis.set_major_formatter(mdates.DateFormatter('%H:%M:%S'))
         
         self.line_4 = self.ax_4.quiver(0,0,0,0, angles='xy', scale_units='xy', scale=1, color="#A30B37")
@@ -95,90 +105,72 @@ class MyMplCanvas(FigureCanvas):
         # Line object
         self.line = [self.line_1, self.line_2, self.line_3, self.line_4, self.sca_1, self.sca_2]
         
-        # Call superclass constructors
-        self.anim = animation.FuncAnimation(self.fig, self.animate, init_func=self.plot_init, 
-                                            interval=500, blit=False)
-        self.paused = True
+        # Frames: the lines are drawn over cached axes backgrounds (blitting), the whole
+        # figure is drawn again only on resize or when the limits change
+        self.backgrounds = None
+        self.mpl_connect('draw_event', self.on_draw)
 
-    def plot_init(self):
-        
-        return self.line
-
-    def animate(self, i):
-        if i==0:
-            self.anim.pause()
-            return self.line
-        self.line[0].set_xdata(self.x)
-        self.line[0].set_ydata(self.mag)
-        self.line[4].set_offsets(np.c_[self.x[self.mark], self.mag[self.mark]])
-        self.ax_1.relim(visible_only=True)
-        self.ax_1.autoscale_view(scalex=False, scaley=True)
-            
-        self.line[1].remove()
-        self.line[1] = self.ax_2.quiver(0, 0, 0,self.u, self.v, self.w, color="#28502E")
-        
-        self.line[2].set_xdata(self.x)
-        self.line[2].set_ydata(self.az)
-        self.line[5].set_offsets(np.c_[self.x[self.mark], self.az[self.mark]])
-        
+    def to_x(self, times):
+        return mdates.date2num(np.asarray(times).astype('datetime64[ns]').astype('datetime64[us]'))
+
+    def update_lines(self):
+        self.update_view()
+        self.line[0].set_data(self.x, self.mag)
+        self.line[4].set_offsets(self.mark[:, [0, 1]])
+        # the 3D arrow is updated in place
+        self.line[1].set_segments(arrow_segments(self.u, self.v, self.w))
+        self.line[2].set_data(self.x, self.az)
+        self.line[5].set_offsets(self.mark[:, [0, 2]])
         self.line[3].set_UVC(self.theta, self.r)
-        try:
-            self.ax_1.set_xlim(xmin=self.x[-1]-timedelta(minutes=1),xmax=self.x[-1])
-            self.ax_3.set_xlim(xmin=self.x[-1]-timedelta(minutes=1),xmax=self.x[-1])
-        except IndexError:
-            pass
-        return self.line
-        
-    def update_line_data(self, time, u, v, w, d2, mag, az):
-        self.x = np.roll(self.x, -1)
-        self.x[-1] = time
-        self.mag = np.roll(self.mag, -1)
-        self.mag[-1] = mag
-        self.az = np.roll(self.az, -1)
-        self.az[-1] = az
-        
-        self.u = u
-        self.v = v
-        self.w = w
-        self.r = d2
-        self.theta = math.radians(az)
-        self.mark = self.mark-1
-        self.mark = self.mark[self.mark>=0]
-        
-    def mark_data(self):
-        self.mark = np.append(self.mark, 609)
-    
-    def toggle_pause(self, *args, **kwargs):
+
+    def update_limits(self):
+        # True when the limits changed, the backgrounds have to be drawn again
+        xlim, ylim = self.next_limits(self.ax_1.get_xlim(), self.ax_1.get_ylim())
+        changed = False
+        if xlim != self.ax_1.get_xlim():
+            self.ax_1.set_xlim(*xlim)
+            self.ax_3.set_xlim(*xlim)
+            changed = True
+        if ylim != self.ax_1.get_ylim():
+            self.ax_1.set_ylim(*ylim)
+            changed = True
+        return changed
+
+    def draw_lines(self):
+        for artist in self.line:
+            if hasattr(artist, 'do_3d_projection'):
+                artist.do_3d_projection()
+            artist.axes.draw_artist(artist)
+
+    def on_draw(self, event):
+        # a full draw leaves out the animated lines: keep it as background and add them
         if self.paused:
-            self.anim.resume()
+            self.backgrounds = None
+            return
+        self.backgrounds = [(ax, self.copy_from_bbox(ax.bbox)) for ax in self.fig.axes]
+        self.draw_lines()
+
+    def render(self):
+        self.update_lines()
+        if self.update_limits() or self.backgrounds is None:
+            self.draw()
         else:
-            self.anim.pause()
-        self.paused = not self.paused
-        
-    def plot_clear(self):
-        self.x = np.empty(610, dtype='O')
-        self.x.fill(datetime(2000,1,1,0,0,0))
-        self.mag = np.empty(610)
-        self.mag.fill(np.nan)
-        self.az = np.empty(610)
-        self.az.fill(np.nan)
-        self.u = 0
-        self.v = 0
-        self.w = 0
-        self.r = 0
-        self.theta = 0
-        self.mark = np.array([], dtype='int')
-        
-        self.line[0].set_xdata(self.x)
-        self.line[0].set_ydata(self.mag)
-        self.line[4].set_offsets(np.c_[self.x[self.mark], self.mag[self.mark]])
-        self.line[1].remove()
-        self.line[1] = self.ax_2.quiver(0, 0, 0,self.u, self.v, self.w, color="#28502E")
-        self.line[2].set_xdata(self.x)
-        self.line[2].set_ydata(self.az)
-        self.line[5].set_offsets(np.c_[self.x[self.mark], self.az[self.mark]])
-        self.line[3].set_UVC(self.theta, self.r)
-        self.draw()
+            for ax, background in self.backgrounds:
+                self.restore_region(background)
+            self.draw_lines()
+            for ax, background in self.backgrounds:
+                self.blit(ax.bbox)
+
+    def refresh(self):
+        self.update_lines()
+        self.update_limits()
+        self.draw_idle()
+
+    def pause_changed(self):
+        # while running the lines are only drawn by blitting
+        for artist in self.line:
+            artist.set_animated(not self.paused)
+        self.draw_idle()
 
 
 class MatplotlibWidget_anim(QWidget):
@@ -191,10 +183,18 @@ class MatplotlibWidget_anim(QWidget):
         self.mpl_ntb = NavigationToolbar(self.mpl, self)  # 增加完整的 toolbar
         self.mpl_ntb.setFixedHeight(30)
         self.mpl_ntb.setIconSize(QSize(30, 30))
+        # length of the live window
+        self.comboBox_window = QComboBox(self)
+        self.comboBox_window.addItems([name for name, seconds in LIVE_WINDOWS])
+        self.comboBox_window.currentIndexChanged.connect(self.mpl.set_window)
         
         self.layout = QVBoxLayout(self)
         self.layout.addWidget(self.mpl)
-        self.layout.addWidget(self.mpl_ntb) #排列toolbar
+        self.layout_ntb = QHBoxLayout()
+        self.layout_ntb.addWidget(self.mpl_ntb) #排列toolbar
+        self.layout_ntb.addWidget(QLabel('Window', self))
+        self.layout_ntb.addWidget(self.comboBox_window)
+        self.layout.addLayout(self.layout_ntb)
 
 
 if __name__ == '__main__':
@@ -8,8 +8,17 @@ from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
 # from matplotlib.backends.backend_qt5agg import NavigationToolbar2QT as NavigationToolbar
 # from matplotlib import cycler, rcParams
 from matplotlib.figure import Figure
+from matplotlib.ticker import PercentFormatter, ScalarFormatter
 
 import numpy as np
+from wind_stats import rose_counts
+
+# periods with more samples are drawn as a wind rose instead of one arrow per sample
+ROSE_SAMPLES = 2000
+# sectors of the wind rose over 360 degrees of azimuth and 180 degrees of elevation
+AZIMUTH_SECTORS = 16
+ELEVATION_SECTORS = 12
+SPEED_CLASSES = 5
 
 
 class MyMplCanvas(FigureCanvas):
@@ -56,6 +65,15 @@ class MyMplCanvas(FigureCanvas):
         self.ax_2.set_thetamin(-90)
         self.ax_2.set_thetamax(90)
         self.ax_2.set_ylim(ymin=0, ymax=0.5)
+        
+        # the period is drawn as arrows, or as a wind rose with the share of samples as radius
+        self.radius = 0.5
+        self.rose = False
+        self.rose_top = (1, 1)
+        self.period_visible = False
+        self.period_artists = [self.line_period1, self.line_period2]
+        # bar containers of the rose, listed by their axes until removed
+        self.period_bars = []
 
     def plot_moment_compass(self, d2, mag, az, el):
         self.line_moment1.set_UVC(np.radians(az), d2)
@@ -64,16 +82,63 @@ class MyMplCanvas(FigureCanvas):
         
     def plot_period_compass(self, d2, mag, az, el):
         data_size = d2.size
-        self.line_period1.remove()
-        self.line_period2.remove()
-        self.line_period1 = self.ax_1.quiver(np.zeros(data_size), np.zeros(data_size), 
-                          np.radians(az), d2, angles='xy', scale_units='xy', scale=1, color="#196157", alpha=0.5,
-                          width=0.01, headwidth=6, headlength=8)
-        self.line_period2 = self.ax_2.quiver(np.zeros(data_size), np.zeros(data_size), 
-                          np.radians(el), mag, angles='xy', scale_units='xy', scale=1, color="#196157", alpha=0.5,
-                          width=0.01, headwidth=6, headlength=8)
+        for artist in self.period_artists:
+            artist.remove()
+        for ax, bars in self.period_bars:
+            ax.containers.remove(bars)
+        self.period_bars = []
+        self.rose = data_size > ROSE_SAMPLES
+        if not self.rose:
+            self.line_period1 = self.ax_1.quiver(np.zeros(data_size), np.zeros(data_size), 
+                              np.radians(az), d2, angles='xy', scale_units='xy', scale=1, color="#196157", alpha=0.5,
+                              width=0.01, headwidth=6, headlength=8)
+            self.line_period2 = self.ax_2.quiver(np.zeros(data_size), np.zeros(data_size), 
+                              np.radians(el), mag, angles='xy', scale_units='xy', scale=1, color="#196157", alpha=0.5,
+                              width=0.01, headwidth=6, headlength=8)
+            self.period_artists = [self.line_period1, self.line_period2]
+        else:
+            # the same speed classes for both roses, the overall speed being the largest
+            top = np.nanmax(mag) if np.isfinite(mag).any() else 1
+            edges = np.linspace(0, top if top > 0 else 1, SPEED_CLASSES+1)
+            width = 360/AZIMUTH_SECTORS
+            bars1, top1 = self.plot_rose(self.ax_1, rose_counts(az, d2, -width/2, width, AZIMUTH_SECTORS, edges), 
+                                         0, width)
+            width = 180/ELEVATION_SECTORS
+            bars2, top2 = self.plot_rose(self.ax_2, rose_counts(el, mag, -90, width, ELEVATION_SECTORS, edges), 
+                                         -90+width/2, width)
+            labels = [f'{low:.2f}-{high:.2f} m/s' for low, high in zip(edges[:-1], edges[1:])]
+            legend = self.fig.legend(bars1, labels, loc='lower right', fontsize=8, frameon=False)
+            self.period_artists = [bar for bars in bars1+bars2 for bar in bars]+[legend]
+            self.period_bars = [(self.ax_1, bars) for bars in bars1]+[(self.ax_2, bars) for bars in bars2]
+            self.rose_top = (top1, top2)
+        for artist in self.period_artists:
+            artist.set_visible(self.period_visible)
+        self.set_radius()
         self.draw()
         
+    def plot_rose(self, ax, counts, first, width):
+        # stacked bars of the share of samples per sector and speed class, centred from first
+        shares = 100*counts/max(counts.sum(), 1)
+        theta = np.radians(first+width*np.arange(len(counts)))
+        colors = matplotlib.cm.viridis(np.linspace(0, 0.9, shares.shape[1]))
+        bottom = np.zeros(len(shares))
+        bars = []
+        for speed_class in range(shares.shape[1]):
+            bars.append(ax.bar(theta, shares[:, speed_class], width=np.radians(width), bottom=bottom, 
+                               color=colors[speed_class], edgecolor='white', linewidth=0.5))
+            bottom = bottom+shares[:, speed_class]
+        return bars, max(bottom.max(), 1)
+        
+    def set_radius(self):
+        # the radius in m/s, or the share of samples of the rose
+        for ax, top in zip((self.ax_1, self.ax_2), self.rose_top):
+            if self.rose and self.period_visible:
+                ax.set_ylim(ymin=0, ymax=top*1.05)
+                ax.yaxis.set_major_formatter(PercentFormatter(decimals=0))
+            else:
+                ax.set_ylim(ymin=0, ymax=self.radius)
+                ax.yaxis.set_major_formatter(ScalarFormatter())
+        
     def show_moment_compass(self):
         print('show')
         self.line_moment1.set_visible(True)
@@ -87,18 +152,22 @@ class MyMplCanvas(FigureCanvas):
         self.draw()
         
     def show_period_compass(self):
-        self.line_period1.set_visible(True)
-        self.line_period2.set_visible(True)
+        self.period_visible = True
+        for artist in self.period_artists:
+            artist.set_visible(True)
+        self.set_radius()
         self.draw()
         
     def hide_period_compass(self):
-        self.line_period1.set_visible(False)
-        self.line_period2.set_visible(False)
+        self.period_visible = False
+        for artist in self.period_artists:
+            artist.set_visible(False)
+        self.set_radius()
         self.draw()
         
     def radius_change(self, r):
-        self.ax_1.set_ylim(ymin=0, ymax=r)
-        self.ax_2.set_ylim(ymin=0, ymax=r)
+        self.radius = r
+        self.set_radius()
         self.draw()
         
 
@@ -12,6 +12,7 @@ from matplotlib.figure import Figure
 
 import numpy as np
 import matplotlib.dates as mdates
+from wind_decimate import MinMaxPyramid
 # from datetime import datetime, timedelta
 
 
@@ -99,27 +100,31 @@ class MyMplCanvas(FigureCanvas):
                                    QSizePolicy.Expanding,
                                    QSizePolicy.Expanding)
         # FigureCanvas.updateGeometry(self)
+
+        # the lines show about two points per pixel of the visible range, picked from a
+        # min/max pyramid of the history; the limits of the shared x axis change through
+        # whichever axes the toolbar or the sliders act on
+        self.pyramid = None
+        for ax in (self.ax_1, self.ax_2, self.ax_3):
+            ax.callbacks.connect('xlim_changed', self.update_detail)
+        self.mpl_connect('resize_event', lambda event: self.update_detail())
         
 
     def plot_trend(self, time, mag, az, el, mark):
         # self.ax_1.cla()
         
-        self.line_1.set_xdata(time)
-        self.line_1.set_ydata(mag)
+        self.x = mdates.date2num(time)
+        self.y = np.column_stack([mag, az, el])
+        self.pyramid = MinMaxPyramid(self.y) if len(time) else None
+        
         self.line_1v.set_xdata(time[0])
         self.sca_1.set_offsets(np.c_[time[mark].astype('O'), mag[mark]])
-        self.ax_1.relim()
-        self.ax_1.autoscale_view(scalex=False, scaley=True)
         self.ax_1.grid(True)
         
-        self.line_2.set_xdata(time)
-        self.line_2.set_ydata(az)
         self.line_2v.set_xdata(time[0])
         self.sca_2.set_offsets(np.c_[time[mark].astype('O'), az[mark]])
         self.ax_2.grid(True)
         
-        self.line_3.set_xdata(time)
-        self.line_3.set_ydata(el)
         self.line_3v.set_xdata(time[0])
         self.sca_3.set_offsets(np.c_[time[mark].astype('O'), el[mark]])
         self.ax_3.grid(True)
@@ -130,8 +135,26 @@ class MyMplCanvas(FigureCanvas):
             # self.ax_3.set_xlim(xmin=time[0], xmax=time[-1])
         except IndexError:
             pass
+        # the whole range keeps every extreme, so the speed scale fits all the data
+        self.update_detail()
+        self.ax_1.relim()
+        self.ax_1.autoscale_view(scalex=False, scaley=True)
         self.draw()
         
+    def update_detail(self, ax=None):
+        # points of the lines for the visible range and the width of the axes; the axes whose
+        # limits changed is passed, its shared axes follow only after the callback
+        if self.pyramid is None:
+            return
+        xmin, xmax = (ax or self.ax_1).get_xlim()
+        # one sample beyond each side, so the lines run to the edges
+        start = max(np.searchsorted(self.x, xmin)-1, 0)
+        stop = min(np.searchsorted(self.x, xmax, side='right')+1, len(self.x))
+        width = max(int((ax or self.ax_1).bbox.width), 1)
+        index = self.pyramid.query(start, stop, width) if stop > start else np.empty((0, 3), dtype=int)
+        for channel, line in enumerate((self.line_1, self.line_2, self.line_3)):
+            line.set_data(self.x[index[:, channel]], self.y[index[:, channel], channel])
+        
     def change_time_range(self, start, end):
         self.ax_2.set_xlim(xmin=start, xmax=end)
         self.draw()
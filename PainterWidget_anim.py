@@ -0,0 +1,174 @@
+import sys
+from PyQt5.QtCore import QPointF, QRectF, Qt
+from PyQt5.QtGui import QColor, QFont, QPainter, QPen, QPolygonF
+from PyQt5.QtWidgets import QApplication, QComboBox, QHBoxLayout, QLabel, QSizePolicy, QVBoxLayout, QWidget
+
+import numpy as np
+import math
+import time
+from LiveCanvas_anim import LiveCanvas
+from wind_decimate import LIVE_WINDOWS
+
+# spacings of the time axis ticks (s)
+TIME_STEPS = (1, 2, 5, 10, 15, 30, 60, 120, 300, 600, 900, 1800, 3600, 7200, 10800, 21600)
+
+def polyline(x, y):
+    # QPolygonF filled through its buffer instead of one QPointF per point
+    polygon = QPolygonF(len(x))
+    buffer = polygon.data()
+    buffer.setsize(len(x)*16)
+    points = np.frombuffer(buffer, dtype=np.float64).reshape(-1, 2)
+    points[:, 0] = x
+    points[:, 1] = y
+    return polygon
+
+def nice_step(span, count=5):
+    # 1, 2 or 5 times a power of ten, giving about count ticks over span
+    raw = span/count
+    power = 10**math.floor(math.log10(raw))
+    for factor in (1, 2, 5, 10):
+        if factor*power >= raw:
+            return factor*power
+
+class MyPainterCanvas(LiveCanvas, QWidget):
+    """Live strip charts and direction indicator painted directly with QPainter.
+
+    It has the interface of MyMplCanvas, without the matplotlib figure: the speed and azimuth
+    envelopes are single polylines and the axes are a few lines and labels.
+    """
+
+    def __init__(self, parent=None):
+        super(MyPainterCanvas, self).__init__(parent)
+        self.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
+        self.setAttribute(Qt.WA_OpaquePaintEvent)
+        self.setFont(QFont('Calibri', 9))
+
+        # live model and redraw scheduler, the time axis in s
+        self.init_live()
+        self.xlim = (0, self.time_window)
+        self.ylim = (0, 1)
+
+    def render(self):
+        self.update_view()
+        self.update_limits()
+        self.repaint()
+
+    def refresh(self):
+        self.update_view()
+        self.update_limits()
+        self.update()
+
+    def update_limits(self):
+        self.xlim, self.ylim = self.next_limits(self.xlim, self.ylim)
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.fillRect(self.rect(), Qt.white)
+        width, height = self.width(), self.height()
+        self.draw_chart(painter, QRectF(0, 0, width*0.6, height/2), 'Wind speed (m/s)',
+                        self.mag, self.mark[:, 1], self.ylim, None, QColor('#1F77B4'))
+        self.draw_chart(painter, QRectF(0, height/2, width*0.6, height/2), 'Wind azimuth (degree)',
+                        self.az, self.mark[:, 2], (0, 360), 90, QColor('#F6BA42'))
+        self.draw_compass(painter, QRectF(width*0.6, 0, width*0.4, height))
+        painter.end()
+
+    def draw_chart(self, painter, rect, title, y, mark_y, ylim, ystep, color):
+        area = rect.adjusted(60, 28, -15, -30)
+        if area.width() <= 0 or area.height() <= 0:
+            return
+        xmin, xmax = self.xlim
+        ymin, ymax = ylim
+        sx = area.width()/(xmax-xmin)
+        sy = area.height()/(ymax-ymin)
+        metrics = painter.fontMetrics()
+        painter.setPen(Qt.black)
+        painter.drawText(QRectF(rect.left(), rect.top()+4, rect.width(), 20), Qt.AlignCenter, title)
+        # grid and tick labels
+        grid = QPen(QColor('#B0B0B0'), 0.8)
+        step = next((step for step in TIME_STEPS if (xmax-xmin)/step <= 6), TIME_STEPS[-1])
+        for tick in np.arange(math.ceil(xmin/step)*step, xmax, step):
+            px = area.left()+(tick-xmin)*sx
+            painter.setPen(grid)
+            painter.drawLine(QPointF(px, area.top()), QPointF(px, area.bottom()))
+            painter.setPen(Qt.black)
+            label = time.strftime('%H:%M:%S', time.gmtime(tick))
+            painter.drawText(QPointF(px-metrics.width(label)/2, area.bottom()+metrics.height()+2), label)
+        ystep = ystep or nice_step(ymax-ymin)
+        for tick in np.arange(math.ceil(ymin/ystep-1e-9)*ystep, ymax+ystep*1e-9, ystep):
+            py = area.bottom()-(tick-ymin)*sy
+            painter.setPen(grid)
+            painter.drawLine(QPointF(area.left(), py), QPointF(area.right(), py))
+            painter.setPen(Qt.black)
+            label = f'{tick:.{max(0, -math.floor(math.log10(ystep)))}f}'
+            painter.drawText(QPointF(area.left()-metrics.width(label)-5, py+metrics.ascent()/2), label)
+        painter.drawRect(area)
+        # envelope and marks inside the plot area
+        painter.setClipRect(area)
+        if y.size:
+            painter.setPen(QPen(color, 1.2))
+            painter.drawPolyline(polyline(area.left()+(self.x-xmin)*sx, area.bottom()-(y-ymin)*sy))
+        painter.setPen(QPen(Qt.red, 1.2))
+        for mx, my in zip(self.mark[:, 0], mark_y):
+            painter.drawEllipse(QPointF(area.left()+(mx-xmin)*sx, area.bottom()-(my-ymin)*sy), 4, 4)
+        painter.setClipping(False)
+
+    def draw_compass(self, painter, rect):
+        # polar indicator as MyMplCanvas: azimuth clockwise from the right, radius up to 0.5
+        metrics = painter.fontMetrics()
+        radius = min(rect.width(), rect.height()*0.7)/2-30
+        if radius <= 0:
+            return
+        center = QPointF(rect.center().x(), rect.top()+rect.height()*0.4)
+        painter.setPen(Qt.black)
+        painter.drawText(QRectF(rect.left(), center.y()-radius-48, rect.width(), 20), Qt.AlignCenter,
+                         'Instant wind azimuth')
+        painter.setRenderHint(QPainter.Antialiasing)
+        painter.setPen(QPen(QColor('#B0B0B0'), 0.8))
+        for ring in (0.2, 0.4, 0.6, 0.8):
+            painter.drawEllipse(center, radius*ring, radius*ring)
+        for angle in range(0, 360, 45):
+            dx, dy = math.cos(math.radians(angle)), math.sin(math.radians(angle))
+            painter.setPen(QPen(QColor('#B0B0B0'), 0.8))
+            painter.drawLine(center, center+QPointF(dx, dy)*radius)
+            painter.setPen(Qt.black)
+            label = f'{angle}°'
+            point = center+QPointF(dx, dy)*(radius+16)
+            painter.drawText(QPointF(point.x()-metrics.width(label)/2, point.y()+metrics.ascent()/2), label)
+        painter.drawEllipse(center, radius, radius)
+        length = min(self.r/0.5, 1)*radius
+        painter.setPen(QPen(QColor('#A30B37'), 2))
+        painter.drawLine(center, center+QPointF(math.cos(self.theta), math.sin(self.theta))*length)
+        painter.setRenderHint(QPainter.Antialiasing, False)
+        # instant wind components in place of the 3D arrow
+        painter.setPen(Qt.black)
+        text = f'u {self.u:+.2f}   v {self.v:+.2f}   w {self.w:+.2f} m/s'
+        painter.drawText(QRectF(rect.left(), center.y()+radius+30, rect.width(), 20), Qt.AlignCenter, text)
+
+
+class PainterWidget_anim(QWidget):
+    def __init__(self, parent=None):
+        super(PainterWidget_anim, self).__init__(parent)
+        self.initUi()
+
+    def initUi(self):
+        # named as in MatplotlibWidget_anim, so both live views are used the same way
+        self.mpl = MyPainterCanvas(self)
+        # length of the live window
+        self.comboBox_window = QComboBox(self)
+        self.comboBox_window.addItems([name for name, seconds in LIVE_WINDOWS])
+        self.comboBox_window.currentIndexChanged.connect(self.mpl.set_window)
+
+        self.layout = QVBoxLayout(self)
+        self.layout.addWidget(self.mpl)
+        self.layout_ntb = QHBoxLayout()
+        self.layout_ntb.addStretch()
+        self.layout_ntb.addWidget(QLabel('Window', self))
+        self.layout_ntb.addWidget(self.comboBox_window)
+        self.layout.addLayout(self.layout_ntb)
+
+
+if __name__ == '__main__':
+    app = QApplication(sys.argv)
+    ui = PainterWidget_anim()
+    ui.show()
+    sys.exit(app.exec_())
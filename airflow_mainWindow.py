@@ -49,6 +49,7 @@ class Ui_MainWindow(object):
         self.formLayout.setWidget(0, QtWidgets.QFormLayout.LabelRole, self.label)
         self.comboBox_port = QtWidgets.QComboBox(self.groupBox)
         self.comboBox_port.setMinimumSize(QtCore.QSize(0, 30))
+        self.comboBox_port.setEditable(True)
         self.comboBox_port.setObjectName("comboBox_port")
         self.formLayout.setWidget(0, QtWidgets.QFormLayout.FieldRole, self.comboBox_port)
         self.label_2 = QtWidgets.QLabel(self.groupBox)
@@ -71,6 +72,70 @@ class Ui_MainWindow(object):
         self.label_6 = QtWidgets.QLabel(self.groupBox)
         self.label_6.setObjectName("label_6")
         self.formLayout.setWidget(1, QtWidgets.QFormLayout.LabelRole, self.label_6)
+        self.label_10 = QtWidgets.QLabel(self.groupBox)
+        self.label_10.setObjectName("label_10")
+        self.formLayout.setWidget(6, QtWidgets.QFormLayout.LabelRole, self.label_10)
+        self.comboBox_baud = QtWidgets.QComboBox(self.groupBox)
+        self.comboBox_baud.setMinimumSize(QtCore.QSize(0, 30))
+        self.comboBox_baud.setEditable(True)
+        self.comboBox_baud.setObjectName("comboBox_baud")
+        self.formLayout.setWidget(6, QtWidgets.QFormLayout.FieldRole, self.comboBox_baud)
+        self.label_11 = QtWidgets.QLabel(self.groupBox)
+        self.label_11.setObjectName("label_11")
+        self.formLayout.setWidget(7, QtWidgets.QFormLayout.LabelRole, self.label_11)
+        self.comboBox_frame = QtWidgets.QComboBox(self.groupBox)
+        self.comboBox_frame.setMinimumSize(QtCore.QSize(0, 30))
+        self.comboBox_frame.setObjectName("comboBox_frame")
+        self.comboBox_frame.addItem("")
+        self.comboBox_frame.addItem("")
+        self.formLayout.setWidget(7, QtWidgets.QFormLayout.FieldRole, self.comboBox_frame)
+        self.label_15 = QtWidgets.QLabel(self.groupBox)
+        self.label_15.setObjectName("label_15")
+        self.formLayout.setWidget(8, QtWidgets.QFormLayout.LabelRole, self.label_15)
+        self.doubleSpinBox_timeout = QtWidgets.QDoubleSpinBox(self.groupBox)
+        self.doubleSpinBox_timeout.setMinimumSize(QtCore.QSize(0, 30))
+        self.doubleSpinBox_timeout.setDecimals(1)
+        self.doubleSpinBox_timeout.setMinimum(0.1)
+        self.doubleSpinBox_timeout.setMaximum(60.0)
+        self.doubleSpinBox_timeout.setSingleStep(0.5)
+        self.doubleSpinBox_timeout.setProperty("value", 2.0)
+        self.doubleSpinBox_timeout.setObjectName("doubleSpinBox_timeout")
+        self.formLayout.setWidget(8, QtWidgets.QFormLayout.FieldRole, self.doubleSpinBox_timeout)
+        self.label_12 = QtWidgets.QLabel(self.groupBox)
+        self.label_12.setObjectName("label_12")
+        self.formLayout.setWidget(9, QtWidgets.QFormLayout.LabelRole, self.label_12)
+        self.comboBox_live = QtWidgets.QComboBox(self.groupBox)
+        self.comboBox_live.setMinimumSize(QtCore.QSize(0, 30))
+        self.comboBox_live.setObjectName("comboBox_live")
+        self.comboBox_live.addItem("")
+        self.comboBox_live.addItem("")
+        self.formLayout.setWidget(9, QtWidgets.QFormLayout.FieldRole, self.comboBox_live)
+        self.label_9 = QtWidgets.QLabel(self.groupBox)
+        self.label_9.setObjectName("label_9")
+        self.formLayout.setWidget(5, QtWidgets.QFormLayout.LabelRole, self.label_9)
+        self.listWidget_ports = QtWidgets.QListWidget(self.groupBox)
+        self.listWidget_ports.setMaximumSize(QtCore.QSize(16777215, 90))
+        self.listWidget_ports.setObjectName("listWidget_ports")
+        self.formLayout.setWidget(5, QtWidgets.QFormLayout.FieldRole, self.listWidget_ports)
+        self.label_8 = QtWidgets.QLabel(self.groupBox)
+        self.label_8.setObjectName("label_8")
+        self.formLayout.setWidget(4, QtWidgets.QFormLayout.LabelRole, self.label_8)
+        self.comboBox_format = QtWidgets.QComboBox(self.groupBox)
+        self.comboBox_format.setMinimumSize(QtCore.QSize(0, 30))
+        self.comboBox_format.setObjectName("comboBox_format")
+        self.comboBox_format.addItem("")
+        self.comboBox_format.addItem("")
+        self.formLayout.setWidget(4, QtWidgets.QFormLayout.FieldRole, self.comboBox_format)
+        self.label_7 = QtWidgets.QLabel(self.groupBox)
+        self.label_7.setObjectName("label_7")
+        self.formLayout.setWidget(3, QtWidgets.QFormLayout.LabelRole, self.label_7)
+        self.comboBox_rotation = QtWidgets.QComboBox(self.groupBox)
+        self.comboBox_rotation.setMinimumSize(QtCore.QSize(0, 30))
+        self.comboBox_rotation.setObjectName("comboBox_rotation")
+        self.comboBox_rotation.addItem("")
+        self.comboBox_rotation.addItem("")
+        self.comboBox_rotation.addItem("")
+        self.formLayout.setWidget(3, QtWidgets.QFormLayout.FieldRole, self.comboBox_rotation)
         self.verticalLayout.addLayout(self.formLayout)
         self.textEdit_saveroute = QtWidgets.QTextEdit(self.groupBox)
         self.textEdit_saveroute.setObjectName("textEdit_saveroute")
@@ -98,6 +163,40 @@ class Ui_MainWindow(object):
         self.push_save.setObjectName("push_save")
         self.verticalLayout_2.addWidget(self.push_save)
         self.verticalLayout_3.addWidget(self.groupBox_2)
+        self.groupBox_7 = QtWidgets.QGroupBox(self.tab)
+        self.groupBox_7.setObjectName("groupBox_7")
+        self.verticalLayout_11 = QtWidgets.QVBoxLayout(self.groupBox_7)
+        self.verticalLayout_11.setObjectName("verticalLayout_11")
+        self.tableWidget_stats = QtWidgets.QTableWidget(self.groupBox_7)
+        self.tableWidget_stats.setMinimumSize(QtCore.QSize(0, 185))
+        font = QtGui.QFont()
+        font.setFamily("Calibri")
+        font.setPointSize(9)
+        self.tableWidget_stats.setFont(font)
+        self.tableWidget_stats.setHorizontalScrollBarPolicy(QtCore.Qt.ScrollBarAlwaysOff)
+        self.tableWidget_stats.setEditTriggers(QtWidgets.QAbstractItemView.NoEditTriggers)
+        self.tableWidget_stats.setSelectionMode(QtWidgets.QAbstractItemView.NoSelection)
+        self.tableWidget_stats.setObjectName("tableWidget_stats")
+        self.tableWidget_stats.setColumnCount(0)
+        self.tableWidget_stats.setRowCount(0)
+        self.tableWidget_stats.horizontalHeader().setMinimumSectionSize(40)
+        self.tableWidget_stats.verticalHeader().setDefaultSectionSize(22)
+        self.verticalLayout_11.addWidget(self.tableWidget_stats)
+        self.verticalLayout_3.addWidget(self.groupBox_7)
+        self.groupBox_6 = QtWidgets.QGroupBox(self.tab)
+        self.groupBox_6.setObjectName("groupBox_6")
+        self.verticalLayout_10 = QtWidgets.QVBoxLayout(self.groupBox_6)
+        self.verticalLayout_10.setObjectName("verticalLayout_10")
+        self.plainTextEdit_metrics = QtWidgets.QPlainTextEdit(self.groupBox_6)
+        font = QtGui.QFont()
+        font.setFamily("Consolas")
+        font.setPointSize(8)
+        self.plainTextEdit_metrics.setFont(font)
+        self.plainTextEdit_metrics.setLineWrapMode(QtWidgets.QPlainTextEdit.NoWrap)
+        self.plainTextEdit_metrics.setReadOnly(True)
+        self.plainTextEdit_metrics.setObjectName("plainTextEdit_metrics")
+        self.verticalLayout_10.addWidget(self.plainTextEdit_metrics)
+        self.verticalLayout_3.addWidget(self.groupBox_6)
         self.horizontalLayout.addLayout(self.verticalLayout_3)
         self.plot_anim = MatplotlibWidget_anim(self.tab)
         self.plot_anim.setObjectName("plot_anim")
@@ -120,9 +219,42 @@ class Ui_MainWindow(object):
         self.push_loadfile = QtWidgets.QPushButton(self.groupBox_3)
         self.push_loadfile.setObjectName("push_loadfile")
         self.verticalLayout_5.addWidget(self.push_loadfile)
+        self.push_loadfolder = QtWidgets.QPushButton(self.groupBox_3)
+        self.push_loadfolder.setObjectName("push_loadfolder")
+        self.verticalLayout_5.addWidget(self.push_loadfolder)
+        self.formLayout_4 = QtWidgets.QFormLayout()
+        self.formLayout_4.setObjectName("formLayout_4")
+        self.label_13 = QtWidgets.QLabel(self.groupBox_3)
+        self.label_13.setObjectName("label_13")
+        self.formLayout_4.setWidget(0, QtWidgets.QFormLayout.LabelRole, self.label_13)
+        self.dateEdit_from = QtWidgets.QDateEdit(self.groupBox_3)
+        self.dateEdit_from.setCalendarPopup(True)
+        self.dateEdit_from.setObjectName("dateEdit_from")
+        self.formLayout_4.setWidget(0, QtWidgets.QFormLayout.FieldRole, self.dateEdit_from)
+        self.label_14 = QtWidgets.QLabel(self.groupBox_3)
+        self.label_14.setObjectName("label_14")
+        self.formLayout_4.setWidget(1, QtWidgets.QFormLayout.LabelRole, self.label_14)
+        self.dateEdit_to = QtWidgets.QDateEdit(self.groupBox_3)
+        self.dateEdit_to.setCalendarPopup(True)
+        self.dateEdit_to.setObjectName("dateEdit_to")
+        self.formLayout_4.setWidget(1, QtWidgets.QFormLayout.FieldRole, self.dateEdit_to)
+        self.verticalLayout_5.addLayout(self.formLayout_4)
         self.textEdit_loadfile = QtWidgets.QTextEdit(self.groupBox_3)
         self.textEdit_loadfile.setObjectName("textEdit_loadfile")
         self.verticalLayout_5.addWidget(self.textEdit_loadfile)
+        self.horizontalLayout_8 = QtWidgets.QHBoxLayout()
+        self.horizontalLayout_8.setObjectName("horizontalLayout_8")
+        self.progressBar_load = QtWidgets.QProgressBar(self.groupBox_3)
+        self.progressBar_load.setMaximum(1000)
+        self.progressBar_load.setProperty("value", 0)
+        self.progressBar_load.setFormat("")
+        self.progressBar_load.setObjectName("progressBar_load")
+        self.horizontalLayout_8.addWidget(self.progressBar_load)
+        self.push_cancel = QtWidgets.QPushButton(self.groupBox_3)
+        self.push_cancel.setEnabled(False)
+        self.push_cancel.setObjectName("push_cancel")
+        self.horizontalLayout_8.addWidget(self.push_cancel)
+        self.verticalLayout_5.addLayout(self.horizontalLayout_8)
         self.verticalLayout_7.addWidget(self.groupBox_3)
         self.groupBox_4 = QtWidgets.QGroupBox(self.tab_2)
         self.groupBox_4.setObjectName("groupBox_4")
@@ -267,6 +399,23 @@ class Ui_MainWindow(object):
         self.push_saveroute.setText(_translate("MainWindow", "Select"))
         self.lineEdit_COM.setText(_translate("MainWindow", "disconnected"))
         self.label_6.setText(_translate("MainWindow", "COM status:"))
+        self.label_10.setText(_translate("MainWindow", "Baud rate: "))
+        self.label_11.setText(_translate("MainWindow", "Frame: "))
+        self.comboBox_frame.setItemText(0, _translate("MainWindow", "ascii"))
+        self.comboBox_frame.setItemText(1, _translate("MainWindow", "binary"))
+        self.label_15.setText(_translate("MainWindow", "Read timeout: "))
+        self.doubleSpinBox_timeout.setSuffix(_translate("MainWindow", " s"))
+        self.label_12.setText(_translate("MainWindow", "Live view: "))
+        self.comboBox_live.setItemText(0, _translate("MainWindow", "matplotlib"))
+        self.comboBox_live.setItemText(1, _translate("MainWindow", "qpainter"))
+        self.label_9.setText(_translate("MainWindow", "More ports: "))
+        self.label_8.setText(_translate("MainWindow", "File format: "))
+        self.comboBox_format.setItemText(0, _translate("MainWindow", "txt"))
+        self.comboBox_format.setItemText(1, _translate("MainWindow", "afb"))
+        self.label_7.setText(_translate("MainWindow", "Rotation: "))
+        self.comboBox_rotation.setItemText(0, _translate("MainWindow", "midnight"))
+        self.comboBox_rotation.setItemText(1, _translate("MainWindow", "hourly"))
+        self.comboBox_rotation.setItemText(2, _translate("MainWindow", "size"))
         self.textEdit_saveroute.setHtml(_translate("MainWindow", "<!DOCTYPE HTML PUBLIC \"-//W3C//DTD HTML 4.0//EN\" \"http://www.w3.org/TR/REC-html40/strict.dtd\">\n"
 "<html><head><meta name=\"qrichtext\" content=\"1\" /><style type=\"text/css\">\n"
 "p, li { white-space: pre-wrap; }\n"
@@ -277,14 +426,22 @@ class Ui_MainWindow(object):
         self.push_mark.setText(_translate("MainWindow", "Mark"))
         self.push_clear.setText(_translate("MainWindow", "Clear"))
         self.push_save.setText(_translate("MainWindow", "Save"))
+        self.groupBox_7.setTitle(_translate("MainWindow", "Statistics"))
+        self.groupBox_6.setTitle(_translate("MainWindow", "Status"))
         self.tabWidget.setTabText(self.tabWidget.indexOf(self.tab), _translate("MainWindow", "Tab 1"))
         self.groupBox_3.setTitle(_translate("MainWindow", "History data"))
         self.push_loadfile.setText(_translate("MainWindow", "Load file"))
+        self.push_loadfolder.setText(_translate("MainWindow", "Load folder"))
+        self.label_13.setText(_translate("MainWindow", "From day"))
+        self.dateEdit_from.setDisplayFormat(_translate("MainWindow", "yyyy/M/d"))
+        self.label_14.setText(_translate("MainWindow", "To day"))
+        self.dateEdit_to.setDisplayFormat(_translate("MainWindow", "yyyy/M/d"))
         self.textEdit_loadfile.setHtml(_translate("MainWindow", "<!DOCTYPE HTML PUBLIC \"-//W3C//DTD HTML 4.0//EN\" \"http://www.w3.org/TR/REC-html40/strict.dtd\">\n"
 "<html><head><meta name=\"qrichtext\" content=\"1\" /><style type=\"text/css\">\n"
 "p, li { white-space: pre-wrap; }\n"
 "</style></head><body style=\" font-family:\'Calibri\'; font-size:10pt; font-weight:400; font-style:normal;\">\n"
 "<p style=\" margin-top:0px; margin-bottom:0px; margin-left:0px; margin-right:0px; -qt-block-indent:0; text-indent:0px;\">./</p></body></html>"))
+        self.push_cancel.setText(_translate("MainWindow", "Cancel"))
         self.groupBox_4.setTitle(_translate("MainWindow", "Time chart control"))
         self.push_plot_trend.setText(_translate("MainWindow", "Plot"))
         self.label_3.setText(_translate("MainWindow", "Start time"))
@@ -0,0 +1,183 @@
+# coding: utf-8
+
+import os
+import struct
+import sys
+import numpy as np
+from wind_parser import FIELDS, parse_records
+
+# Air Flow Monitor binary file (.afb)
+#   header : magic, version, number of float columns
+#   chunks : chunk header (magic, rows, first time, last time), then the columns
+#            time int64[n], u/v/w/d2/mag/az/el float32[n] each, mark uint8[n],
+#            padded to 8 bytes
+#   footer : index of (offset, rows, first time, last time) per chunk and a
+#            trailer with the chunk count and the index offset
+EXTENSION = '.afb'
+VERSION = 1
+HEADER = struct.Struct('<4sHH8x')
+HEADER_MAGIC = b'AFMB'
+CHUNK = struct.Struct('<4sI8xqq')
+CHUNK_MAGIC = b'CHNK'
+TRAILER = struct.Struct('<4sIqq')
+TRAILER_MAGIC = b'AFMI'
+INDEX_DTYPE = np.dtype([('offset', '<i8'), ('rows', '<i8'), ('start', '<i8'), ('end', '<i8')])
+ROW_BYTES = 8+4*FIELDS+1
+
+def chunk_bytes(rows):
+    size = CHUNK.size+rows*ROW_BYTES
+    return size+(-size) % 8
+
+def read_index(read_at, size):
+    # chunk index from the footer, or from the chunk headers when the file was not closed
+    if size >= HEADER.size+TRAILER.size:
+        magic, version, count, offset = TRAILER.unpack(read_at(size-TRAILER.size, TRAILER.size))
+        if magic == TRAILER_MAGIC and offset+count*INDEX_DTYPE.itemsize == size-TRAILER.size:
+            index = np.frombuffer(read_at(offset, count*INDEX_DTYPE.itemsize), dtype=INDEX_DTYPE)
+            return index, offset
+    index = []
+    offset = HEADER.size
+    while offset+CHUNK.size <= size:
+        magic, rows, start, end = CHUNK.unpack(read_at(offset, CHUNK.size))
+        if magic != CHUNK_MAGIC or offset+chunk_bytes(rows) > size:
+            break
+        index.append((offset, rows, start, end))
+        offset += chunk_bytes(rows)
+    return np.array(index, dtype=INDEX_DTYPE), offset
+
+class WindBinaryWriter:
+    """Append chunks to a binary file, the index footer is written on close."""
+
+    def __init__(self, path, chunk_size=4096):
+        self.path = path
+        self.chunk_size = chunk_size
+        self.index = []
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            # continue an existing file, the old footer is overwritten
+            self.file = open(path, 'r+b')
+            magic, version, fields = HEADER.unpack(self.file.read(HEADER.size))
+            if magic != HEADER_MAGIC or fields != FIELDS:
+                raise ValueError(f'{path} is not an air flow binary file')
+            index, end = read_index(self._read_at, os.path.getsize(path))
+            self.index = index.tolist()
+            self.file.truncate(end)
+            self.file.seek(end)
+        else:
+            self.file = open(path, 'wb')
+            self.file.write(HEADER.pack(HEADER_MAGIC, VERSION, FIELDS))
+
+    def _read_at(self, offset, n):
+        self.file.seek(offset)
+        return self.file.read(n)
+
+    def write(self, times, data, marks):
+        # every call writes whole chunks, so a crash never leaves a partial flush behind
+        for start in range(0, len(times), self.chunk_size):
+            end = start+self.chunk_size
+            self._write_chunk(times[start:end], data[start:end], marks[start:end])
+
+    def _write_chunk(self, times, data, marks):
+        rows = len(times)
+        offset = self.file.tell()
+        self.file.write(CHUNK.pack(CHUNK_MAGIC, rows, int(times[0]), int(times[-1])))
+        self.file.write(np.ascontiguousarray(times, dtype='<i8').tobytes())
+        self.file.write(np.ascontiguousarray(np.asarray(data, dtype='<f4').T).tobytes())
+        self.file.write(np.ascontiguousarray(marks, dtype=np.uint8).tobytes())
+        self.file.write(b'\x00'*(chunk_bytes(rows)-CHUNK.size-rows*ROW_BYTES))
+        self.index.append((offset, rows, int(times[0]), int(times[-1])))
+
+    def tell(self):
+        return self.file.tell()
+
+    def flush(self):
+        self.file.flush()
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def close(self):
+        index_offset = self.file.tell()
+        self.file.write(np.array(self.index, dtype=INDEX_DTYPE).tobytes())
+        self.file.write(TRAILER.pack(TRAILER_MAGIC, VERSION, len(self.index), index_offset))
+        self.file.close()
+
+class WindBinaryFile:
+    """Memory-mapped reader of a binary file with time range lookups."""
+
+    def __init__(self, path):
+        self.path = path
+        self.map = np.memmap(path, dtype=np.uint8, mode='r')
+        magic, version, fields = HEADER.unpack_from(self.map, 0)
+        if magic != HEADER_MAGIC or fields != FIELDS:
+            raise ValueError(f'{path} is not an air flow binary file')
+        self.index, self.data_end = read_index(lambda offset, n: self.map[offset:offset+n].tobytes(),
+                                               self.map.size)
+
+    def __len__(self):
+        return int(self.index['rows'].sum())
+
+    def time_range(self):
+        if not self.index.size:
+            return None
+        return int(self.index['start'][0]), int(self.index['end'][-1])
+
+    def _columns(self, row):
+        offset, rows = int(row['offset'])+CHUNK.size, int(row['rows'])
+        times = np.frombuffer(self.map, dtype='<i8', count=rows, offset=offset)
+        offset += 8*rows
+        data = np.frombuffer(self.map, dtype='<f4', count=rows*FIELDS, offset=offset).reshape((FIELDS, rows)).T
+        offset += 4*FIELDS*rows
+        marks = np.frombuffer(self.map, dtype=np.uint8, count=rows, offset=offset)
+        return times, data, marks
+
+    def read(self, start=None, end=None):
+        # samples with start <= time < end (int64 ns), only the overlapping chunks are touched
+        first, last = 0, self.index.size
+        if start is not None:
+            first = np.searchsorted(self.index['end'], start)
+        if end is not None:
+            last = np.searchsorted(self.index['start'], end)
+        times, data, marks = [], [], []
+        for row in self.index[first:last]:
+            chunk_time, chunk_data, chunk_mark = self._columns(row)
+            lo, hi = 0, chunk_time.size
+            if start is not None:
+                lo = np.searchsorted(chunk_time, start)
+            if end is not None:
+                hi = np.searchsorted(chunk_time, end)
+            times.append(chunk_time[lo:hi])
+            data.append(chunk_data[lo:hi])
+            marks.append(chunk_mark[lo:hi])
+        if not len(times):
+            return (np.empty(0, dtype=np.int64), np.empty((0, FIELDS), dtype=np.float32),
+                    np.empty(0, dtype=np.uint8))
+        return np.concatenate(times), np.concatenate(data), np.concatenate(marks)
+
+    def close(self):
+        del self.map
+
+def convert_text(text_path, binary_path=None, block_lines=65536):
+    # convert a daily text file, block by block so memory stays bounded
+    if binary_path is None:
+        binary_path = os.path.splitext(text_path)[0]+EXTENSION
+    if os.path.exists(binary_path):
+        os.remove(binary_path)
+    writer = WindBinaryWriter(binary_path)
+    bad = 0
+    with open(text_path) as f:
+        while True:
+            lines = f.readlines(block_lines*70)
+            if not lines:
+                break
+            times, data, marks, valid = parse_records(lines)
+            bad += valid.size-np.count_nonzero(valid)
+            if len(times):
+                writer.write(times, data, marks)
+    writer.close()
+    return binary_path, bad
+
+if __name__ == '__main__':
+    # python wind_binary.py 230101.txt [230102.txt ...]
+    for path in sys.argv[1:]:
+        binary_path, bad = convert_text(path)
+        print(f'{path} -> {binary_path} ({bad} wrong lines skipped)')
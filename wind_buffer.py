@@ -0,0 +1,107 @@
+# coding: utf-8
+
+import threading
+import numpy as np
+from wind_parser import FIELDS, format_records
+
+# bits of the mark column
+MARK_USER = 1
+
+class WindBuffer:
+    """Chunked columnar store of the live session: int64 ns time, 7 floats and a mark bitmask."""
+
+    def __init__(self, chunk_size=65536):
+        self.chunk_size = chunk_size
+        # shared by the reader thread and the GUI when the buffer is filled in the background
+        self.lock = threading.RLock()
+        self.clear()
+
+    def clear(self):
+        self.time = []
+        self.data = []
+        self.mark = []
+        # samples used in the last chunk and samples dropped from the first chunk
+        self.used = 0
+        self.offset = 0
+
+    def __len__(self):
+        if not len(self.time):
+            return 0
+        return (len(self.time)-1)*self.chunk_size+self.used-self.offset
+
+    def _new_chunk(self):
+        self.time.append(np.empty(self.chunk_size, dtype=np.int64))
+        self.data.append(np.empty((self.chunk_size, FIELDS)))
+        self.mark.append(np.zeros(self.chunk_size, dtype=np.uint8))
+        self.used = 0
+
+    def append(self, times, data, marks=None):
+        # times in datetime64 or int64 ns, data with shape (n, 7)
+        times = np.asarray(times)
+        if times.dtype.kind == 'M':
+            times = times.astype('datetime64[ns]').astype(np.int64)
+        size = len(times)
+        done = 0
+        while done < size:
+            if not len(self.time) or self.used == self.chunk_size:
+                self._new_chunk()
+            n = min(size-done, self.chunk_size-self.used)
+            self.time[-1][self.used:self.used+n] = times[done:done+n]
+            self.data[-1][self.used:self.used+n] = data[done:done+n]
+            if marks is None:
+                self.mark[-1][self.used:self.used+n] = 0
+            else:
+                self.mark[-1][self.used:self.used+n] = marks[done:done+n]
+            self.used += n
+            done += n
+
+    def mark_last(self, flag=MARK_USER):
+        if len(self):
+            self.mark[-1][self.used-1] |= flag
+
+    def _chunk_range(self, i):
+        start = self.offset if i == 0 else 0
+        end = self.used if i == len(self.time)-1 else self.chunk_size
+        return start, end
+
+    def arrays(self, start=None, end=None):
+        # concatenated copies of the samples with start <= time < end (int64 ns)
+        times = []
+        data = []
+        marks = []
+        for i in range(len(self.time)):
+            lo, hi = self._chunk_range(i)
+            chunk_time = self.time[i][lo:hi]
+            if start is not None:
+                lo += np.searchsorted(chunk_time, start)
+            if end is not None:
+                hi = self._chunk_range(i)[0]+np.searchsorted(chunk_time, end)
+            if hi > lo:
+                times.append(self.time[i][lo:hi])
+                data.append(self.data[i][lo:hi])
+                marks.append(self.mark[i][lo:hi])
+        if not len(times):
+            return (np.empty(0, dtype=np.int64), np.empty((0, FIELDS)),
+                    np.empty(0, dtype=np.uint8))
+        return np.concatenate(times), np.concatenate(data), np.concatenate(marks)
+
+    def discard_before(self, end):
+        # drop the samples with time < end without copying the kept ones
+        while len(self.time):
+            lo, hi = self._chunk_range(0)
+            cut = lo+np.searchsorted(self.time[0][lo:hi], end)
+            if cut < hi or len(self.time) == 1:
+                if cut == hi:
+                    self.clear()
+                else:
+                    self.offset = cut
+                return
+            del self.time[0], self.data[0], self.mark[0]
+            self.offset = 0
+
+    def to_text(self, start=None, end=None):
+        return records_text(*self.arrays(start, end))
+
+def records_text(times, data, marks):
+    # lines of the daily text file from the columns returned by WindBuffer.arrays
+    return format_records(times.astype('datetime64[ns]'), data, (marks & MARK_USER) != 0)
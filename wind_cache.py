@@ -0,0 +1,89 @@
+# coding: utf-8
+
+import hashlib
+import logging
+import os
+import shutil
+import numpy as np
+from wind_parser import read_records
+
+logger = logging.getLogger(__name__)
+
+# columns of a cache entry, one .npy file each
+COLUMNS = ('times', 'data', 'marks', 'bad')
+
+class ParseCache:
+    """Parsed columns of history text files, kept as .npy files that load memory-mapped.
+
+    An entry is named after the path of the text file and its size and modification time,
+    so an edited or growing file never hits a stale entry; the stale entries of a path are
+    removed when it is parsed again. The least recently used entries are removed when the
+    folder grows beyond max_bytes.
+    """
+
+    def __init__(self, folder, max_bytes=2*2**30):
+        self.folder = folder
+        self.max_bytes = max_bytes
+
+    def _names(self, path):
+        # (prefix of every entry of the path, entry of its current version)
+        stat = os.stat(path)
+        prefix = hashlib.sha1(os.path.abspath(path).encode('utf-8')).hexdigest()[:16]
+        return prefix, f'{prefix}_{stat.st_size}_{stat.st_mtime_ns}'
+
+    def read_records(self, path, progress=None):
+        # as wind_parser.read_records, from the cache when the file did not change
+        prefix, name = self._names(path)
+        entry = os.path.join(self.folder, name)
+        if os.path.isdir(entry):
+            try:
+                columns = [np.load(os.path.join(entry, f'{column}.npy'), mmap_mode='r') for column in COLUMNS]
+                # the access time of an entry is its modification time, for the eviction
+                os.utime(entry)
+                return columns[0], columns[1], columns[2], columns[3].tolist()
+            except (OSError, ValueError):
+                logger.warning(f'Cache entry of {path} is broken, it is parsed again')
+                shutil.rmtree(entry, ignore_errors=True)
+        times, data, marks, bad = read_records(path, progress=progress)
+        try:
+            self._store(prefix, name, (times, data, marks, np.array(bad, dtype=np.int64)))
+        except OSError as e:
+            logger.warning(f'Can not cache {path}: {e}')
+        return times, data, marks, bad
+
+    def _store(self, prefix, name, columns):
+        os.makedirs(self.folder, exist_ok=True)
+        for other in os.listdir(self.folder):
+            if other.startswith(prefix+'_') and other != name:
+                shutil.rmtree(os.path.join(self.folder, other), ignore_errors=True)
+        # written aside and renamed, so a half written entry is never loaded
+        temporary = os.path.join(self.folder, f'{name}.tmp{os.getpid()}')
+        os.makedirs(temporary, exist_ok=True)
+        for column, values in zip(COLUMNS, columns):
+            np.save(os.path.join(temporary, f'{column}.npy'), values)
+        try:
+            os.rename(temporary, os.path.join(self.folder, name))
+        except OSError:
+            # stored meanwhile by another process
+            shutil.rmtree(temporary, ignore_errors=True)
+        self.evict()
+
+    def evict(self):
+        # remove the least recently used entries beyond max_bytes
+        entries = []
+        for name in os.listdir(self.folder):
+            entry = os.path.join(self.folder, name)
+            if not os.path.isdir(entry) or '.tmp' in name:
+                continue
+            size = sum(os.path.getsize(os.path.join(entry, file)) for file in os.listdir(entry))
+            entries.append((os.path.getmtime(entry), size, entry))
+        total = sum(size for used, size, entry in entries)
+        for used, size, entry in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                shutil.rmtree(entry)
+                total -= size
+            except OSError:
+                # still mapped by a loaded history on some systems
+                pass
@@ -0,0 +1,93 @@
+# coding: utf-8
+
+import logging
+import time
+from datetime import datetime
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+def wall_ns():
+    # local wall clock time in int64 ns, the time base of the recorded files
+    return int(np.datetime64(datetime.now(), 'ns').astype(np.int64))
+
+class SampleClock:
+    """Evenly spaced int64 ns sample times from one monotonic stamp per read batch.
+
+    The times advance by the sample period and are pulled slowly towards the read times, so
+    read jitter stays out of the timeline while rate errors are corrected. The monotonic
+    clock is mapped to the wall clock by a slewed offset.
+    """
+
+    def __init__(self, rate=None, gain=0.05, max_error=1.0, max_slew=0.0005, max_step=2.0,
+                 estimate_time=1.0):
+        # nominal period (ns), estimated from the reads when the rate is not known
+        self.nominal = 1e9/rate if rate else None
+        self.gain = gain
+        self.max_error = int(max_error*1e9)
+        self.max_slew = max_slew
+        self.max_step = int(max_step*1e9)
+        self.estimate_time = int(estimate_time*1e9)
+        self.period = self.nominal
+        self.estimate_start = None
+        self.estimate_count = 0
+        self.offset = wall_ns()-time.monotonic_ns()
+        self.offset_time = time.monotonic_ns()
+        self.last = None
+
+    def reset(self):
+        # after a gap the next batch starts a new timeline
+        self.last = None
+
+    def _track_wall(self, now):
+        # follow wall clock corrections slowly, jump only for a step such as a manual change
+        error = wall_ns()-now-self.offset
+        if abs(error) > self.max_step:
+            logger.info(f'Wall clock stepped by {error/1e9:.3f} s')
+            self.offset += error
+        else:
+            limit = int((now-self.offset_time)*self.max_slew)
+            self.offset += max(-limit, min(limit, error))
+        self.offset_time = now
+
+    def stamp(self, count, read_ns, interval_ns):
+        # times of count samples, the newest received by the read at read_ns (monotonic ns);
+        # interval_ns is the time since the previous read
+        self._track_wall(read_ns)
+        read = read_ns+self.offset
+        steps = np.arange(1, count+1)
+        if self.last is not None and self.period is not None:
+            error = read-(self.last+self.period*count)
+            if abs(error) > self.max_error:
+                logger.info(f'Sample times resynchronised by {error/1e9:.3f} s')
+                self.last = None
+                if self.nominal is None:
+                    self.period = None
+        if self.period is None:
+            # estimate the period from the reads first, meanwhile spread the samples between them
+            if self.last is None:
+                self.estimate_start = read
+                self.estimate_count = 0
+                last = read-interval_ns
+            else:
+                last = self.last
+                self.estimate_count += count
+            if read-self.estimate_start >= self.estimate_time:
+                self.period = (read-self.estimate_start)/self.estimate_count
+            times = last+np.round((read-last)/count*steps).astype(np.int64)
+            self.last = int(times[-1])
+            return times
+        if self.last is None:
+            # new timeline ending at the read
+            times = read-np.round(self.period*(count-steps)).astype(np.int64)
+            self.last = int(times[-1])
+            return times
+        # phase correction spread over the batch, critically damped frequency correction
+        period = max(self.period+self.gain*error/count, self.period/2)
+        self.period = max(self.period+self.gain**2/4*error/count, 1.0)
+        if self.nominal is not None:
+            # the instrument clock is close to its nominal rate
+            self.period = min(max(self.period, 0.95*self.nominal), 1.05*self.nominal)
+        times = self.last+np.round(period*steps).astype(np.int64)
+        self.last = int(times[-1])
+        return times
@@ -0,0 +1,147 @@
+# coding: utf-8
+
+import argparse
+import configparser
+import logging
+import os
+import re
+import signal
+import sys
+import time
+from logging.handlers import TimedRotatingFileHandler
+from wind_engine import WindEngine, device_name
+from wind_metrics import export_snapshot
+from wind_protocol import DECODERS
+from wind_recorder import FILE_FORMATS, FSYNC_POLICIES, ROTATIONS
+
+# Headless acquisition: the engine and recorders of the GUI without PyQt5 or
+# matplotlib. The GUI can show the recorded samples live with the port
+# follow://OUTPUT (or follow://OUTPUT/DEVICE for several ports).
+#
+#   python wind_daemon.py --port COM3 --output D:/wind --rotation hourly
+#   python wind_daemon.py --config wind_daemon.ini
+#
+# The config file holds the same options in a [daemon] section, e.g.
+#   [daemon]
+#   port = /dev/ttyUSB0, /dev/ttyUSB1
+#   output = /var/lib/wind
+#   rotation = midnight
+# and the command line overrides it.
+
+logger = logging.getLogger('wind_daemon')
+
+DEFAULTS = {'port': '', 'output': '.', 'rotation': 'midnight', 'format': 'txt',
+            'baud': '38400', 'frame': 'ascii', 'timeout': '2', 'rate': '0', 'flush_interval': '1',
+            'fsync': 'rotate', 'max_size': '100', 'log': './log', 'metrics_interval': '60'}
+
+def setup_logger(folder):
+    formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    console = logging.StreamHandler()
+    console.setFormatter(formatter)
+    root = logging.getLogger()
+    root.handlers.clear()
+    root.addHandler(console)
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+        timedfile = TimedRotatingFileHandler(filename=os.path.join(folder, 'Air Flow Daemon.log'),
+                                             when='midnight', backupCount=60,
+                                             encoding='utf-8')
+        timedfile.suffix = "%Y-%m-%d.log"
+        timedfile.extMatch = re.compile(r"^\d{4}-\d{2}-\d{2}.log$")
+        timedfile.setFormatter(formatter)
+        root.addHandler(timedfile)
+    root.setLevel(logging.INFO)
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Record 3D anemometers without the GUI')
+    parser.add_argument('--config', help='INI file with a [daemon] section of these options')
+    parser.add_argument('--port', action='append',
+                        help='serial port or source url, repeat for several anemometers')
+    parser.add_argument('--output', help='folder of the recorded files')
+    parser.add_argument('--rotation', choices=ROTATIONS)
+    parser.add_argument('--format', choices=FILE_FORMATS, help='file format')
+    parser.add_argument('--baud', type=int, help='baud rate')
+    parser.add_argument('--frame', choices=tuple(DECODERS), help='frame format')
+    parser.add_argument('--timeout', type=float, help='read timeout (s)')
+    parser.add_argument('--rate', type=float, help='nominal sample rate (Hz), 0 to estimate it')
+    parser.add_argument('--flush-interval', type=float, help='period of the group commit (s)')
+    parser.add_argument('--fsync', choices=FSYNC_POLICIES)
+    parser.add_argument('--max-size', type=int, help='file size of the size rotation (MB)')
+    parser.add_argument('--log', help='log folder, empty to log to the console only')
+    parser.add_argument('--metrics-interval', type=float,
+                        help='period of the metrics export to the log folder (s), 0 for none')
+    args = parser.parse_args(argv)
+    # command line over config file over defaults
+    config = configparser.ConfigParser(defaults=DEFAULTS)
+    config.add_section('daemon')
+    if args.config:
+        if not config.read(args.config):
+            parser.error(f'Cannot read {args.config}')
+    section = config['daemon']
+    ports = args.port or [port.strip() for port in section['port'].split(',') if port.strip()]
+    if not ports:
+        parser.error('No port given')
+    options = dict(ports=ports,
+                   output=args.output or section['output'],
+                   rotation=args.rotation or section['rotation'],
+                   format=args.format or section['format'],
+                   baud=args.baud or section.getint('baud'),
+                   frame=args.frame or section['frame'],
+                   timeout=args.timeout if args.timeout is not None else section.getfloat('timeout'),
+                   rate=args.rate if args.rate is not None else section.getfloat('rate'),
+                   flush_interval=(args.flush_interval if args.flush_interval is not None
+                                   else section.getfloat('flush_interval')),
+                   fsync=args.fsync or section['fsync'],
+                   max_size=args.max_size if args.max_size is not None else section.getint('max_size'),
+                   log=args.log if args.log is not None else section['log'],
+                   metrics_interval=(args.metrics_interval if args.metrics_interval is not None
+                                     else section.getfloat('metrics_interval')))
+    return options
+
+def on_status(device, status):
+    logger.info(f'{device.port}: {status}')
+
+def main(argv=None):
+    options = parse_args(argv)
+    setup_logger(options['log'])
+    ports = options['ports']
+    engine = WindEngine(on_status=on_status)
+    for port in ports:
+        folder = options['output']
+        if len(ports) > 1:
+            # per-device files when several anemometers are recorded, as in the GUI
+            folder = os.path.join(folder, device_name(port))
+        # no live buffer, the samples only go to the recorder
+        engine.add_device(port, folder, baudrate=options['baud'], timeout=options['timeout'],
+                          frame_format=options['frame'], rate=options['rate'] or None,
+                          rotation=options['rotation'],
+                          max_bytes=options['max_size']*2**20,
+                          flush_interval=options['flush_interval'], fsync=options['fsync'],
+                          file_format=options['format'])
+    try:
+        engine.start()
+    except Exception as error:
+        logger.error(f'Cannot start: {error}')
+        return 1
+    logger.info(f'Recording {", ".join(ports)} to {options["output"]}')
+    # stop cleanly on Ctrl+C and on the service manager's SIGTERM
+    def stop(signum, frame):
+        logger.info(f'Signal {signum}, stopping')
+        engine.stop(wait=False)
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+    interval = options['metrics_interval'] if options['log'] else 0
+    export = time.monotonic()
+    while engine.running():
+        time.sleep(0.5)
+        if interval > 0 and time.monotonic()-export >= interval:
+            export = time.monotonic()
+            export_snapshot(options['log'], engine.metrics.snapshot('file'))
+    engine.stop()
+    if interval > 0:
+        export_snapshot(options['log'], engine.metrics.snapshot('file'))
+    logger.info('All devices stopped')
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,198 @@
+# coding: utf-8
+
+import numpy as np
+
+# windows of the live views (s), each drawn from buckets about one pixel wide
+LIVE_WINDOWS = (('1 min', 60), ('10 min', 600), ('1 h', 3600), ('24 h', 86400))
+LIVE_BUCKETS = 1000
+
+class CascadeRing:
+    """Min, max, sum and count of a few channels per time bucket, at several resolutions.
+
+    Samples go into the finest level. Every bucket a level closes goes into the next coarser
+    one, whose width must be a multiple. Each level keeps its newest buckets in a ring, so
+    a window of any length is drawn from a bounded number of buckets.
+    """
+
+    def __init__(self, widths, channels, capacity=1200):
+        # bucket widths in int64 ns, finest first
+        self.widths = [int(width) for width in widths]
+        self.channels = channels
+        self.capacity = capacity
+        self.clear()
+
+    def clear(self):
+        self.levels = []
+        for width in self.widths:
+            self.levels.append({'time': np.zeros(self.capacity, dtype=np.int64),
+                                'min': np.zeros((self.capacity, self.channels)),
+                                'max': np.zeros((self.capacity, self.channels)),
+                                'sum': np.zeros((self.capacity, self.channels)),
+                                'count': np.zeros(self.capacity, dtype=np.int64),
+                                'head': 0, 'filled': 0,
+                                # the bucket still being filled: (id, min, max, sum, count)
+                                'open': None})
+
+    def add(self, times, values):
+        # times in int64 ns, ascending; values with shape (n, channels)
+        if len(times):
+            values = np.asarray(values, dtype=float).reshape((-1, self.channels))
+            self._push(0, np.asarray(times, dtype=np.int64), values, values, values,
+                       np.ones(len(times), dtype=np.int64))
+
+    def _push(self, index, times, mins, maxs, sums, counts):
+        level = self.levels[index]
+        ids = times//self.widths[index]
+        starts = np.r_[0, np.flatnonzero(np.diff(ids))+1]
+        ids = ids[starts]
+        mins = np.minimum.reduceat(mins, starts, axis=0)
+        maxs = np.maximum.reduceat(maxs, starts, axis=0)
+        sums = np.add.reduceat(sums, starts, axis=0)
+        counts = np.add.reduceat(counts, starts)
+        opened = level['open']
+        if opened is not None:
+            if opened[0] == ids[0]:
+                # the first group continues the open bucket
+                mins[0] = np.minimum(mins[0], opened[1])
+                maxs[0] = np.maximum(maxs[0], opened[2])
+                sums[0] += opened[3]
+                counts[0] += opened[4]
+            else:
+                ids = np.r_[opened[0], ids]
+                mins = np.vstack([opened[1], mins])
+                maxs = np.vstack([opened[2], maxs])
+                sums = np.vstack([opened[3], sums])
+                counts = np.r_[opened[4], counts]
+        level['open'] = (ids[-1], mins[-1], maxs[-1], sums[-1], counts[-1])
+        if len(ids) == 1:
+            return
+        # every group but the last is closed
+        closed = ids[:-1]*self.widths[index]
+        self._store(level, closed, mins[:-1], maxs[:-1], sums[:-1], counts[:-1])
+        if index+1 < len(self.levels):
+            self._push(index+1, closed, mins[:-1], maxs[:-1], sums[:-1], counts[:-1])
+
+    def _store(self, level, times, mins, maxs, sums, counts):
+        times = times[-self.capacity:]
+        size = len(times)
+        mins, maxs, sums, counts = mins[-size:], maxs[-size:], sums[-size:], counts[-size:]
+        done = 0
+        while done < size:
+            head = level['head']
+            n = min(size-done, self.capacity-head)
+            level['time'][head:head+n] = times[done:done+n]
+            level['min'][head:head+n] = mins[done:done+n]
+            level['max'][head:head+n] = maxs[done:done+n]
+            level['sum'][head:head+n] = sums[done:done+n]
+            level['count'][head:head+n] = counts[done:done+n]
+            level['head'] = (head+n) % self.capacity
+            done += n
+        level['filled'] = min(level['filled']+size, self.capacity)
+
+    def buckets(self, index, start=None):
+        # bucket start times, min, max and mean of the level from start on (int64 ns),
+        # oldest first and including the data not closed yet at the finer levels
+        level = self.levels[index]
+        width = self.widths[index]
+        head, filled = level['head'], level['filled']
+        order = np.arange(head-filled, head) % self.capacity
+        ids = list(level['time'][order]//width)
+        mins = list(level['min'][order])
+        maxs = list(level['max'][order])
+        sums = list(level['sum'][order])
+        counts = list(level['count'][order])
+        # open buckets from coarse to fine, each newer than the closed buckets before it
+        for finer in range(index, -1, -1):
+            opened = self.levels[finer]['open']
+            if opened is None:
+                continue
+            bucket = opened[0]*self.widths[finer]//width
+            if ids and ids[-1] == bucket:
+                mins[-1] = np.minimum(mins[-1], opened[1])
+                maxs[-1] = np.maximum(maxs[-1], opened[2])
+                sums[-1] = sums[-1]+opened[3]
+                counts[-1] = counts[-1]+opened[4]
+            elif not ids or ids[-1] < bucket:
+                ids.append(bucket)
+                mins.append(opened[1])
+                maxs.append(opened[2])
+                sums.append(opened[3])
+                counts.append(opened[4])
+        if not ids:
+            empty = np.empty((0, self.channels))
+            return np.empty(0, dtype=np.int64), empty, empty, empty
+        times = np.array(ids, dtype=np.int64)*width
+        mins, maxs = np.array(mins), np.array(maxs)
+        means = np.array(sums)/np.array(counts)[:, None]
+        if start is not None:
+            keep = times+width > start
+            times, mins, maxs, means = times[keep], mins[keep], maxs[keep], means[keep]
+        return times, mins, maxs, means
+
+class MinMaxPyramid:
+    """Positions of the minimum and maximum of every block of a long series, for block sizes
+    growing by a factor.
+
+    A range of any length is drawn from the coarsest level with at least one block per pixel,
+    regrouped to one block per pixel: about two points per pixel, the real samples at the
+    extremes, so every peak keeps its value and time.
+    """
+
+    def __init__(self, values, base=4, factor=4):
+        # values with one column per channel
+        self.values = np.asarray(values).reshape((len(values), -1))
+        count, channels = self.values.shape
+        self.channels = np.arange(channels)
+        self.sizes, self.mins, self.maxs = [], [], []
+        index_type = np.int32 if count < 2**31 else np.int64
+        mins = maxs = np.repeat(np.arange(count, dtype=index_type)[:, None], channels, axis=1)
+        size, group = 1, base
+        while len(mins) > 1:
+            mins, maxs = self._reduce(mins, maxs, group)
+            size *= group
+            self.sizes.append(size)
+            self.mins.append(mins)
+            self.maxs.append(maxs)
+            group = factor
+
+    def _reduce(self, mins, maxs, group):
+        # positions of the extremes over every group of consecutive candidates
+        padding = -len(mins) % group
+        if padding:
+            mins = np.concatenate([mins, np.repeat(mins[-1:], padding, axis=0)])
+            maxs = np.concatenate([maxs, np.repeat(maxs[-1:], padding, axis=0)])
+        mins = mins.reshape((-1, group, len(self.channels)))
+        maxs = maxs.reshape((-1, group, len(self.channels)))
+        low = self.values[mins, self.channels].argmin(axis=1)[:, None, :]
+        high = self.values[maxs, self.channels].argmax(axis=1)[:, None, :]
+        return np.take_along_axis(mins, low, axis=1)[:, 0], np.take_along_axis(maxs, high, axis=1)[:, 0]
+
+    def _cover(self, start, stop, level):
+        # candidates of exactly the samples start to stop: the whole blocks of the level, the
+        # partial blocks at the edges from the finer levels, so no extreme outside is drawn
+        if level < 0 or stop-start < self.sizes[level]:
+            if level < 0:
+                index = np.repeat(np.arange(start, stop)[:, None], len(self.channels), axis=1)
+                return index, index
+            return self._cover(start, stop, level-1)
+        size = self.sizes[level]
+        first, last = -(-start//size), stop//size
+        left_mins, left_maxs = self._cover(start, first*size, level-1)
+        right_mins, right_maxs = self._cover(last*size, stop, level-1)
+        return (np.concatenate([left_mins, self.mins[level][first:last], right_mins]),
+                np.concatenate([left_maxs, self.maxs[level][first:last], right_maxs]))
+
+    def query(self, start, stop, width):
+        # sample positions to draw the samples start to stop on width pixels, one column per
+        # channel, in time order
+        count = stop-start
+        if count <= 2*width:
+            return np.repeat(np.arange(start, stop)[:, None], len(self.channels), axis=1)
+        level = -1
+        while level+1 < len(self.sizes) and self.sizes[level+1]*width <= count:
+            level += 1
+        mins, maxs = self._cover(start, stop, level)
+        group = -(-len(mins)//width)
+        if group > 1:
+            mins, maxs = self._reduce(mins, maxs, group)
+        return np.stack([np.minimum(mins, maxs), np.maximum(mins, maxs)], axis=1).reshape((-1, len(self.channels)))
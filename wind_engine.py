@@ -0,0 +1,281 @@
+# coding: utf-8
+
+import logging
+import os
+import re
+import threading
+import time
+import traceback
+from collections import deque
+from wind_buffer import MARK_USER
+from wind_clock import SampleClock
+from wind_metrics import WindMetrics
+from wind_protocol import DECODERS
+from wind_recorder import WindRecorder
+from wind_source import open_port
+from wind_stats import RollingStats
+
+logger = logging.getLogger(__name__)
+
+# status of a device, shown next to its port
+SEARCHING = 'searching...'
+CONNECTED = 'connected'
+WRONG_FORMAT = 'wrong format'
+DISCONNECTED = 'disconnected'
+RECORD_FAILED = 'recording failed'
+
+def device_name(port):
+    # short name of a port for folders and file names: COM3, ttyUSB0, sim_50
+    name = os.path.basename(port.rstrip('/')) if '://' not in port else port
+    return re.sub(r'[^\w.-]+', '_', name).strip('_')
+
+class WindDevice(threading.Thread):
+    """One anemometer: its port, reader thread, live buffer, recorder and status.
+
+    Without buffer no samples are kept in memory, without folder nothing is recorded and
+    without stats windows no running statistics are kept.
+    """
+
+    def __init__(self, engine, port, folder, recorder_options, buffer=None,
+                 baudrate=38400, timeout=2, frame_format='ascii', rate=None, stats_windows=None):
+        super(WindDevice, self).__init__(daemon=True)
+        self.engine = engine
+        self.port = port
+        self.name = device_name(port)
+        self.folder = folder
+        self.recorder_options = recorder_options
+        self.buffer = buffer
+        self.lock = threading.Lock() if buffer is None else buffer.lock
+        self.baudrate = baudrate
+        self.timeout = timeout
+        if frame_format not in DECODERS:
+            raise ValueError(f'Unknown frame format: {frame_format}')
+        self.decoder = DECODERS[frame_format]()
+        # nominal sample rate of the instrument (Hz), estimated when None
+        self.clock = SampleClock(rate)
+        self.stats = RollingStats(stats_windows) if stats_windows else None
+        # samples received, so a mark names the sample the buffer marked
+        self.received = 0
+        self.status = DISCONNECTED
+        self.active = False
+        self.ser = None
+        self.recorder = None
+        self.metrics = engine.metrics
+        # minimum period between two batches (s) and the largest single read (bytes)
+        self.batch_interval = 0.1
+        self.chunk_size = 65536
+
+    def open(self):
+        # the folder first, so a folder that can not be created leaves no port open
+        if self.folder is not None:
+            os.makedirs(self.folder, exist_ok=True)
+        self.ser = open_port(self.port, self.baudrate, self.timeout)
+        if self.folder is not None:
+            # the sample numbers of the marks count from the start of the new recorder
+            with self.lock:
+                self.received = 0
+            self.recorder = WindRecorder(self.folder, **self.recorder_options)
+            self.recorder.start()
+
+    def close(self):
+        self.ser.close()
+        if self.recorder is not None:
+            self.recorder.close()
+
+    def set_status(self, status):
+        if status != self.status:
+            self.status = status
+            self.engine.on_status(self, status)
+
+    def run(self):
+        logger.info(f'Start monitoring {self.port}')
+        self.active = True
+        self.set_status(SEARCHING)
+        self.decoder.reset()
+        self.clock.reset()
+        last_read = time.monotonic_ns()
+        while self.active:
+            start = time.monotonic()
+            # drain the input buffer in one read, block for the first byte only
+            try:
+                waiting = self.ser.in_waiting
+                chunk = self.ser.read(min(max(waiting, 1), self.chunk_size))
+            except Exception:
+                logger.error(f'{traceback.format_exc()}')
+                break
+            read_ns = time.monotonic_ns()
+            read_time = read_ns/1e9
+            self.metrics.observe(f'{self.name} read', read_time-start)
+            if not len(chunk):
+                self.decoder.reset()
+                if self.status != SEARCHING:
+                    logger.warning(f'{self.port} is empty.')
+                self.set_status(SEARCHING)
+                self.clock.reset()
+                last_read = time.monotonic_ns()
+                continue
+            data, bad, first = self.decoder.decode(chunk)
+            self.metrics.observe(f'{self.name} parse', time.monotonic()-read_time)
+            self.metrics.count(f'{self.name} bytes', len(chunk))
+            if bad:
+                self.metrics.count(f'{self.name} bad frames', bad)
+                logger.warning(f'{self.port}: {bad} frames have a wrong format. First raw frame: {first}')
+            if len(data):
+                # one monotonic stamp per read, evenly spaced int64 ns sample times
+                times = self.clock.stamp(len(data), read_ns, read_ns-last_read)
+                try:
+                    self.receive(times, data, read_time)
+                except Exception:
+                    logger.error(f'{traceback.format_exc()}')
+            elif bad:
+                self.set_status(WRONG_FORMAT)
+            last_read = read_ns
+            # let the input buffer fill up so one batch carries many frames
+            remain = self.batch_interval-(time.monotonic()-start)
+            if remain > 0:
+                time.sleep(remain)
+        self.active = False
+        self.close()
+        self.set_status(DISCONNECTED)
+        logger.info(f'Stop monitoring {self.port}')
+        self.engine.on_stop(self)
+
+    def receive(self, times, data, read_time):
+        self.set_status(CONNECTED if self.recorder is None or self.recorder.error is None else RECORD_FAILED)
+        start = time.monotonic()
+        with self.lock:
+            if self.buffer is not None:
+                self.buffer.append(times, data)
+            self.received += len(times)
+        # out of the buffer lock: the write waits while the recorder is behind, the GUI must not
+        if self.recorder is not None:
+            self.recorder.write(times, data)
+            self.metrics.set_level(f'{self.name} recorder queue', self.recorder.queue.qsize())
+            self.metrics.set_level(f'{self.name} recorder unwritten', self.recorder.pending_size)
+        if self.stats is not None:
+            self.stats.add(times, data)
+        self.metrics.observe(f'{self.name} handoff', time.monotonic()-start)
+        self.metrics.count(f'{self.name} samples', len(data))
+        self.engine.on_batch(self, times, data, read_time)
+
+    def mark_last(self, flag=MARK_USER):
+        with self.lock:
+            if self.buffer is not None:
+                self.buffer.mark_last(flag)
+            if self.recorder is not None and self.received:
+                self.recorder.mark_sample(self.received-1, flag)
+
+    def exit(self):
+        self.active = False
+
+class BatchQueue:
+    """Bounded handoff of batches from a reader thread to a slower consumer such as the GUI.
+
+    When the consumer stalls the oldest batches are dropped and counted. put tells when the
+    consumer has to be woken up, so at most one wake-up is pending however many batches wait.
+    """
+
+    def __init__(self, metrics, name, capacity=64):
+        self.metrics = metrics
+        self.name = name
+        self.capacity = capacity
+        self.batches = deque()
+        self.waiting = False
+
+    def put(self, times, data, read_time):
+        # reader thread: deque append and popleft are atomic, no lock is needed
+        self.batches.append((times, data, read_time, time.monotonic()))
+        while len(self.batches) > self.capacity:
+            try:
+                dropped = self.batches.popleft()
+            except IndexError:
+                break
+            self.metrics.count(f'{self.name} display dropped', len(dropped[1]))
+        self.metrics.set_level(f'{self.name} display queue', len(self.batches))
+        if self.waiting:
+            return False
+        self.waiting = True
+        return True
+
+    def take(self):
+        # consumer: clear the wake-up first, so a batch put meanwhile wakes it up again
+        self.waiting = False
+        batches = []
+        now = time.monotonic()
+        while self.batches:
+            try:
+                times, data, read_time, put_time = self.batches.popleft()
+            except IndexError:
+                break
+            self.metrics.observe('display wait', now-put_time)
+            batches.append((times, data, read_time))
+        self.metrics.set_level(f'{self.name} display queue', len(self.batches))
+        return batches
+
+class WindEngine:
+    """Acquisition of several anemometers, one reader thread per port.
+
+    on_batch gets the device, the int64 ns sample times and data, and the monotonic time of the read.
+    """
+
+    def __init__(self, on_batch=None, on_status=None, on_stop=None):
+        self.devices = []
+        self.metrics = WindMetrics()
+        self.batch_callback = on_batch
+        self.status_callback = on_status
+        self.stop_callback = on_stop
+
+    def add_device(self, port, folder, buffer=None, baudrate=38400, timeout=2,
+                   frame_format='ascii', rate=None, stats_windows=None, **recorder_options):
+        device = WindDevice(self, port, folder, recorder_options, buffer,
+                            baudrate, timeout, frame_format, rate, stats_windows)
+        self.devices.append(device)
+        return device
+
+    def device(self, port):
+        for device in self.devices:
+            if device.port == port:
+                return device
+        return None
+
+    def start(self):
+        # open every port first, so a wrong port stops the whole start
+        opened = []
+        try:
+            for device in self.devices:
+                device.open()
+                opened.append(device)
+        except Exception:
+            for device in opened:
+                device.close()
+            raise
+        for device in self.devices:
+            device.start()
+
+    def stop(self, wait=True):
+        for device in self.devices:
+            device.exit()
+        if wait:
+            for device in self.devices:
+                if device.is_alive():
+                    device.join()
+
+    def running(self):
+        return any(device.is_alive() for device in self.devices)
+
+    def mark_last(self, flag=MARK_USER):
+        for device in self.devices:
+            device.mark_last(flag)
+
+    # callbacks, called from the reader threads
+    def on_batch(self, device, times, data, read_time):
+        if self.batch_callback is not None:
+            self.batch_callback(device, times, data, read_time)
+
+    def on_status(self, device, status):
+        if self.status_callback is not None:
+            self.status_callback(device, status)
+
+    def on_stop(self, device):
+        if self.stop_callback is not None:
+            self.stop_callback(device)
@@ -0,0 +1,161 @@
+# coding: utf-8
+
+import os
+import re
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+import numpy as np
+from wind_binary import EXTENSION, WindBinaryFile
+from wind_cache import ParseCache
+from wind_parser import FIELDS, merge_blocks
+
+# files of the recorder: YYMMDD, YYMMDD_HH0000 or YYMMDD_HHMMSS, text or binary
+RECORD_FILE_PATTERN = re.compile(r'(\d{6})(?:_\d{6})?(?:\.txt|%s)' % re.escape(EXTENSION))
+
+def record_files(folder, first=None, last=None):
+    # recorded files of the folder from the day first to the day last (dates), in time order;
+    # of a text file and its binary conversion only the binary file is kept
+    names = set(os.listdir(folder))
+    files = []
+    for name in sorted(names):
+        match = RECORD_FILE_PATTERN.fullmatch(name)
+        if not match:
+            continue
+        stem, extension = os.path.splitext(name)
+        if extension != EXTENSION and stem+EXTENSION in names:
+            continue
+        try:
+            day = datetime.strptime(match.group(1), '%y%m%d').date()
+        except ValueError:
+            continue
+        if (first is None or day >= first) and (last is None or day <= last):
+            files.append((day, os.path.join(folder, name)))
+    return files
+
+def sort_unique(times, data, marks):
+    # columns in time order, a timestamp repeated by overlapping files (a text file and a
+    # binary file of the same period, a snapshot saved from a recorded period) kept once
+    if np.any(np.diff(times) <= 0):
+        order = np.argsort(times, kind='stable')
+        times, data, marks = times[order], data[order], marks[order]
+        keep = np.r_[True, np.diff(times) != 0]
+        times, data, marks = times[keep], data[keep], marks[keep]
+    return times, data, marks
+
+def _parse_file(folder, max_bytes, path):
+    # in a worker process: parse a text file into the cache, the main process maps it
+    ParseCache(folder, max_bytes).read_records(path)
+
+def load_files(paths, cache, workers=None, progress=None):
+    # parse the text files in parallel through the cache and merge all files into one time
+    # sorted set of columns; also returns the skipped line numbers per file.
+    # progress(bytes, lines, blocks) is called as the load goes on, with the (times, data,
+    # marks) loaded so far
+    texts = [path for path in paths if not path.endswith(EXTENSION)]
+    loaded = {}
+    done_bytes, done_lines = 0, 0
+    blocks = []
+    if len(texts) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(_parse_file, cache.folder, cache.max_bytes, path): path for path in texts}
+            try:
+                for future in as_completed(futures):
+                    future.result()
+                    # mapped at once, before the entry may be evicted by a later file
+                    path = futures[future]
+                    loaded[path] = cache.read_records(path)
+                    done_bytes += os.path.getsize(path)
+                    done_lines += len(loaded[path][0])+len(loaded[path][3])
+                    blocks.append(loaded[path][:3])
+                    if progress is not None:
+                        progress(done_bytes, done_lines, blocks)
+            except BaseException:
+                # the files not started are dropped, the ones being parsed still finish
+                # (cancelled one by one, shutdown(cancel_futures=True) needs Python 3.9)
+                for future in futures:
+                    future.cancel()
+                raise
+    times, data, marks, bad = [], [], [], {}
+    for path in paths:
+        if path.endswith(EXTENSION):
+            reader = WindBinaryFile(path)
+            file_times, file_data, file_marks = reader.read()
+            reader.close()
+            file_bad = []
+        elif path in loaded:
+            file_times, file_data, file_marks, file_bad = loaded[path]
+        else:
+            def file_progress(characters, lines, file_blocks):
+                progress(done_bytes+characters, done_lines+lines, blocks+file_blocks)
+            file_times, file_data, file_marks, file_bad = cache.read_records(
+                path, progress=None if progress is None else file_progress)
+            done_bytes += os.path.getsize(path)
+            done_lines += len(file_times)+len(file_bad)
+            blocks.append((file_times, file_data, file_marks))
+        times.append(file_times)
+        data.append(file_data)
+        marks.append(file_marks)
+        if file_bad:
+            bad[path] = file_bad
+    if not times:
+        return np.empty(0, dtype=np.int64), np.empty((0, FIELDS)), np.empty(0, dtype=np.uint8), bad
+    times = np.concatenate(times)
+    data = np.concatenate(data).astype(float, copy=False)
+    marks = np.concatenate(marks)
+    times, data, marks = sort_unique(times, data, marks)
+    return times, data, marks, bad
+
+class LoadCancelled(Exception):
+    """Raised from a progress callback to stop a load."""
+
+class HistoryLoader(threading.Thread):
+    """Load history files in the background, with progress and cancellation.
+
+    on_progress(bytes, total bytes, lines) follows the load. A load longer than
+    partial_interval also passes the data loaded so far to on_partial(times, data, marks),
+    at intervals doubling each time as the partial data grows. The result of load_files is
+    handed to on_done once, an exception to on_error, and a cancelled load calls neither.
+    """
+
+    def __init__(self, paths, cache, workers=None, on_progress=None, on_partial=None,
+                 on_done=None, on_error=None, partial_interval=2.0):
+        super(HistoryLoader, self).__init__(daemon=True)
+        self.paths = paths
+        self.cache = cache
+        self.workers = workers
+        self.on_progress = on_progress
+        self.on_partial = on_partial
+        self.on_done = on_done
+        self.on_error = on_error
+        self.partial_interval = partial_interval
+        self.total_bytes = sum(os.path.getsize(path) for path in paths)
+        self.cancelled = threading.Event()
+
+    def cancel(self):
+        self.cancelled.set()
+
+    def run(self):
+        self.partial_time = time.monotonic()
+        try:
+            result = load_files(self.paths, self.cache, self.workers, self.progress)
+        except LoadCancelled:
+            return
+        except Exception as e:
+            self.on_error(e)
+            return
+        # cancelled after the last progress call
+        if not self.cancelled.is_set():
+            self.on_done(result)
+
+    def progress(self, done_bytes, lines, blocks):
+        if self.cancelled.is_set():
+            raise LoadCancelled()
+        self.on_progress(done_bytes, self.total_bytes, lines)
+        now = time.monotonic()
+        if self.on_partial is not None and now-self.partial_time >= self.partial_interval:
+            self.partial_time = now
+            self.partial_interval *= 2
+            times, data, marks = sort_unique(*merge_blocks(blocks))
+            self.on_partial(times, data, marks)
@@ -0,0 +1,40 @@
+# coding: utf-8
+
+import numpy as np
+
+class TimeIndex:
+    """Slider positions over a time range, one per step, and the samples nearest to them.
+
+    A position and its time convert arithmetically, and samples are found by binary search
+    in the sorted sample times, so no lookup depends on the length of the history.
+    """
+
+    def __init__(self, times, start=None, end=None, step=np.timedelta64(1, 's')):
+        # times: sorted datetime64 of the samples; the range from start to end included,
+        # by default the whole seconds of the samples
+        self.times = times
+        self.step = step
+        self.first = np.datetime64(times[0] if start is None else start, 's')
+        self.last = np.datetime64(times[-1] if end is None else end, 's')
+        self.size = max(int((self.last-self.first)//step)+1, 0)
+        self.last = self.first+(self.size-1)*step
+
+    def time(self, position):
+        # time of a slider position
+        return self.first+int(position)*self.step
+
+    def position(self, time):
+        # slider position of a time, None when it is not one of the steps of the range
+        offset = np.datetime64(time, 's')-self.first
+        position, rest = divmod(offset, self.step)
+        if rest or not 0 <= position < self.size:
+            return None
+        return int(position)
+
+    def nearest(self, time):
+        # index of the sample nearest to a time
+        time = np.datetime64(time).astype(self.times.dtype)
+        index = int(np.searchsorted(self.times, time))
+        if index == len(self.times) or (index > 0 and time-self.times[index-1] <= self.times[index]-time):
+            index -= 1
+        return index
@@ -0,0 +1,98 @@
+# coding: utf-8
+
+import json
+import math
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+import numpy as np
+
+class WindMetrics:
+    """Counters, durations and levels of the live pipeline, shared by the reader threads and the GUI.
+
+    Each reader of the metrics (status panel, metrics file) gets the rates, percentiles and
+    peaks since its own previous snapshot.
+    """
+
+    def __init__(self, window=4096):
+        self.window = window
+        self.lock = threading.Lock()
+        self.start = time.monotonic()
+        self.counters = {}
+        # (monotonic time, seconds) of the latest observations
+        self.durations = {}
+        self.levels = {}
+        self.readers = {}
+
+    def count(self, name, n=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0)+n
+
+    def observe(self, name, seconds):
+        with self.lock:
+            if name not in self.durations:
+                self.durations[name] = deque(maxlen=self.window)
+            self.durations[name].append((time.monotonic(), seconds))
+
+    def set_level(self, name, value):
+        with self.lock:
+            self._level(name, value)
+
+    def add_level(self, name, delta):
+        with self.lock:
+            self._level(name, self.levels.get(name, 0)+delta)
+
+    def _level(self, name, value):
+        self.levels[name] = value
+        for reader in self.readers.values():
+            reader['peaks'][name] = max(reader['peaks'].get(name, value), value)
+
+    def snapshot(self, reader='panel'):
+        # rates, percentiles and peaks since the previous snapshot of this reader
+        now = time.monotonic()
+        with self.lock:
+            state = self.readers.setdefault(reader, {'time': self.start, 'counters': {}, 'peaks': {}})
+            elapsed = max(now-state['time'], 1e-9)
+            result = {}
+            for name, total in sorted(self.counters.items()):
+                result[f'{name}/s'] = (total-state['counters'].get(name, 0))/elapsed
+                result[f'{name} total'] = total
+            for name, observations in sorted(self.durations.items()):
+                values = np.array([seconds for stamp, seconds in observations if stamp > state['time']])*1000
+                if values.size:
+                    p50, p99 = np.percentile(values, (50, 99))
+                    longest = values.max()
+                else:
+                    p50 = p99 = longest = math.nan
+                result[f'{name} p50 (ms)'] = float(p50)
+                result[f'{name} p99 (ms)'] = float(p99)
+                result[f'{name} max (ms)'] = float(longest)
+            for name, value in sorted(self.levels.items()):
+                result[name] = value
+                result[f'{name} peak'] = max(state['peaks'].get(name, value), value)
+            state['time'] = now
+            state['counters'] = dict(self.counters)
+            state['peaks'] = dict(self.levels)
+        return result
+
+def format_snapshot(snapshot):
+    # one line per metric for the status panel
+    lines = []
+    for name, value in snapshot.items():
+        if isinstance(value, float):
+            lines.append(f'{name}: {value:.1f}')
+        else:
+            lines.append(f'{name}: {value}')
+    return '\n'.join(lines)
+
+def export_snapshot(folder, snapshot):
+    # append the snapshot as one JSON line to the metrics file of the day
+    now = datetime.now()
+    file_name = os.path.join(folder, now.strftime('metrics_%Y-%m-%d.jsonl'))
+    record = {'time': now.isoformat(timespec='seconds')}
+    record.update({name: None if isinstance(value, float) and math.isnan(value) else value
+                   for name, value in snapshot.items()})
+    with open(file_name, 'a') as f:
+        f.write(json.dumps(record)+'\n')
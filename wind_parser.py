@@ -0,0 +1,129 @@
+# coding: utf-8
+
+import re
+import numpy as np
+
+# one ASCII frame of the 3D anemometer: u, v, w, d2, mag, az, el
+FIELDS = 7
+FRAME_PATTERN = re.compile(r'\s*-?\d+\.\d+(?:\s+-?\d+\.\d+){%d}\s*' % (FIELDS-1))
+# one line of the daily text file: time,u,v,w,d2,mag,az,el,mark
+RECORD_PATTERN = re.compile(r'\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}\.\d{6}(?:,-?\d+\.\d+){%d},\d\s*' % FIELDS)
+# layout of its time stamp, '0' standing for any digit
+STAMP_SIZE = 26
+STAMP_TEMPLATE = np.frombuffer(b'0000-00-00 00:00:00.000000', dtype=np.uint8)
+STAMP_DIGITS = STAMP_TEMPLATE == ord('0')
+
+def parse_frames(frames):
+    # validate all frames and convert the valid ones in a single float conversion
+    size = len(frames)
+    valid = np.fromiter((FRAME_PATTERN.fullmatch(frame) is not None for frame in frames),
+                        dtype=bool, count=size)
+    data = np.full((size, FIELDS), np.nan)
+    if valid.any():
+        text = ' '.join([frame for frame, ok in zip(frames, valid) if ok])
+        data[valid] = np.array(text.split(), dtype=float).reshape((-1, FIELDS))
+    return data, valid
+
+def format_values(values):
+    # shortest text of each value in fixed point, as RECORD_PATTERN reads it: str writes the
+    # very small and very large values as 3e-05
+    text = values.astype(str)
+    size = np.abs(values.astype(float))
+    exponent = np.isfinite(values) & (size != 0) & ((size < 1e-4) | (size >= 1e16))
+    if exponent.any():
+        text = text.astype(object)
+        text[exponent] = [np.format_float_positional(value, trim='0') for value in values[exponent]]
+    return text.tolist()
+
+def format_records(times, data, marks):
+    # build the lines of the daily text file: time,u,v,w,d2,mag,az,el,mark
+    if not len(times):
+        return ''
+    stamps = np.datetime_as_string(np.asarray(times).astype('datetime64[us]'), unit='us')
+    columns = [stamps.tolist()]
+    columns += [format_values(data[:, i]) for i in range(FIELDS)]
+    columns.append(np.asarray(marks).astype(int).astype(str).tolist())
+    text = '\n'.join(map(','.join, zip(*columns)))+'\n'
+    return text.replace('T', ' ')
+
+def parse_stamps(stamps):
+    # fixed width time stamps 'YYYY-MM-DD HH:MM:SS.ffffff' (ASCII bytes) into int64 ns,
+    # with the mask of the well formed ones
+    chars = np.frombuffer(stamps, dtype=np.uint8).reshape((-1, STAMP_SIZE))
+    digits = chars.astype(np.int64)-ord('0')
+    valid = np.where(STAMP_DIGITS, (digits >= 0) & (digits <= 9), chars == STAMP_TEMPLATE).all(axis=1)
+    def number(start, end):
+        return digits[:, start:end].dot(10**np.arange(end-start-1, -1, -1))
+    year, month, day = number(0, 4), number(5, 7), number(8, 10)
+    hour, minute, second, micro = number(11, 13), number(14, 16), number(17, 19), number(20, 26)
+    valid &= (month >= 1) & (month <= 12) & (day >= 1) & (day <= 31) & (hour < 24) & (minute < 60) & (second < 60)
+    months = np.where(valid, (year-1970)*12+month-1, 0)
+    days = months.astype('datetime64[M]').astype('datetime64[D]').astype(np.int64)+day-1
+    return (((days*24+hour)*60+minute)*60+second)*10**9+micro*1000, valid
+
+def parse_numbers(lines):
+    # the FIELDS+1 numbers after the time stamp of every line in one conversion, None if
+    # a number is malformed; the lines hold FIELDS+1 commas, checked by parse_records
+    if not lines:
+        return np.empty((0, FIELDS+1))
+    text = ','.join([line[STAMP_SIZE+1:] for line in lines])
+    try:
+        return np.array(text.split(','), dtype=float).reshape((-1, FIELDS+1))
+    except ValueError:
+        return None
+
+def valid_numbers(line):
+    try:
+        numbers = [float(field) for field in line[STAMP_SIZE+1:].split(',')]
+    except ValueError:
+        return False
+    return len(numbers) == FIELDS+1
+
+def parse_records(lines):
+    # convert the lines of a daily text file into int64 ns time, 7 floats and uint8 mark
+    shaped = [len(line) > STAMP_SIZE+1 and line[STAMP_SIZE] == ',' and line.count(',') == FIELDS+1
+              for line in lines]
+    valid = np.fromiter(shaped, dtype=bool, count=len(lines))
+    selected = [line for line, ok in zip(lines, shaped) if ok]
+    numbers = parse_numbers(selected)
+    if numbers is None:
+        # slow path, only for blocks with a malformed number: find the lines line by line
+        checked = [valid_numbers(line) for line in selected]
+        valid[valid] = checked
+        selected = [line for line, ok in zip(selected, checked) if ok]
+        numbers = parse_numbers(selected)
+    stamps = ''.join([line[:STAMP_SIZE] for line in selected]).encode('ascii', errors='replace')
+    times, good = parse_stamps(stamps)
+    marks = numbers[:, FIELDS]
+    good &= (marks >= 0) & (marks <= 255) & (marks == np.floor(marks))
+    valid[valid] = good
+    return times[good], numbers[good, :FIELDS], marks[good].astype(np.uint8), valid
+
+def read_records(path, block_lines=65536, progress=None):
+    # load a daily text file block by block into typed columns; also returns the numbers
+    # (from 1) of the lines skipped, blank lines apart. progress(characters, lines, blocks) is
+    # called after every block with the (times, data, marks) of the blocks read so far
+    blocks, bad = [], []
+    characters = 0
+    first_line = 1
+    with open(path, errors='replace') as f:
+        while True:
+            lines = f.readlines(block_lines*70)
+            if not lines:
+                break
+            times, data, marks, valid = parse_records(lines)
+            bad += [first_line+index for index in np.flatnonzero(~valid).tolist() if lines[index].strip()]
+            first_line += len(lines)
+            characters += sum(map(len, lines))
+            blocks.append((times, data, marks))
+            if progress is not None:
+                progress(characters, first_line-1, blocks)
+    times, data, marks = merge_blocks(blocks)
+    return times, data, marks, bad
+
+def merge_blocks(blocks):
+    # one set of columns from a list of (times, data, marks)
+    if not blocks:
+        return np.empty(0, dtype=np.int64), np.empty((0, FIELDS)), np.empty(0, dtype=np.uint8)
+    times, data, marks = zip(*blocks)
+    return np.concatenate(times), np.concatenate(data), np.concatenate(marks)
@@ -0,0 +1,98 @@
+# coding: utf-8
+
+import struct
+import numpy as np
+from wind_parser import FIELDS, parse_frames
+
+# binary frame: sync word, u/v/w/d2/mag/az/el as little-endian float32 and the
+# 8-bit sum of the payload bytes
+BINARY_SYNC = b'\xa5\x5a'
+BINARY_PAYLOAD = struct.Struct('<%df' % FIELDS)
+BINARY_FRAME_SIZE = len(BINARY_SYNC)+BINARY_PAYLOAD.size+1
+BAUD_RATES = (9600, 19200, 38400, 57600, 115200, 230400, 460800, 921600)
+
+def decimal_float32(values):
+    # float32 to the float64 with 7 significant digits, so 0.3 is stored as 0.3
+    values = values.astype(float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        digits = 6-np.floor(np.log10(np.abs(values)))
+    digits[~np.isfinite(digits)] = 0
+    scale = 10.0**digits
+    return np.round(values*scale)/scale
+
+class AsciiDecoder:
+    """Frames of seven decimal numbers terminated by CR."""
+
+    def __init__(self):
+        self.pending = b''
+
+    def reset(self):
+        self.pending = b''
+
+    def decode(self, chunk):
+        # split complete frames and keep the partial tail for the next chunk
+        parts = (self.pending+chunk).split(b'\r')
+        self.pending = parts.pop()
+        frames = [part.decode(errors='replace').strip().strip('\x00') for part in parts]
+        frames = [frame for frame in frames if len(frame)]
+        data, valid = parse_frames(frames)
+        bad = valid.size-np.count_nonzero(valid)
+        first = frames[np.flatnonzero(~valid)[0]] if bad else ''
+        return data[valid], bad, first
+
+class BinaryDecoder:
+    """Fixed-size binary frames validated by their checksum."""
+
+    def __init__(self):
+        self.pending = b''
+
+    def reset(self):
+        self.pending = b''
+
+    def decode(self, chunk):
+        buf = np.frombuffer(self.pending+chunk, dtype=np.uint8)
+        last = buf.size-BINARY_FRAME_SIZE
+        if last < 0:
+            self.pending = buf.tobytes()
+            return np.empty((0, FIELDS)), 0, ''
+        # every complete frame that starts with the sync word
+        starts = np.flatnonzero((buf[:last+1] == BINARY_SYNC[0]) & (buf[1:last+2] == BINARY_SYNC[1]))
+        # checksum of all candidates at once from the running sum of the bytes
+        total = np.r_[0, np.cumsum(buf, dtype=np.int64)]
+        first = starts+len(BINARY_SYNC)
+        stop = first+BINARY_PAYLOAD.size
+        ok = (total[stop]-total[first]) % 256 == buf[stop]
+        # a sync word inside an accepted frame is payload, not a new frame
+        good = starts[ok]
+        if np.any(np.diff(good) < BINARY_FRAME_SIZE):
+            kept = []
+            for start in good.tolist():
+                if not kept or start >= kept[-1]+BINARY_FRAME_SIZE:
+                    kept.append(start)
+            good = np.array(kept, dtype=good.dtype)
+        wrong = starts[~ok]
+        if good.size and wrong.size:
+            before = np.searchsorted(good, wrong, side='right')-1
+            inside = (before >= 0) & (wrong < good[np.maximum(before, 0)]+BINARY_FRAME_SIZE)
+            wrong = wrong[~inside]
+        # keep the bytes that may still start a frame
+        end = good[-1]+BINARY_FRAME_SIZE if good.size else 0
+        self.pending = buf[max(end, last+1):].tobytes()
+        offsets = good[:, None]+len(BINARY_SYNC)+np.arange(BINARY_PAYLOAD.size)
+        data = decimal_float32(buf[offsets].copy().view('<f4').reshape((-1, FIELDS)))
+        first = buf[wrong[0]:wrong[0]+BINARY_FRAME_SIZE].tobytes().hex() if wrong.size else ''
+        return data, wrong.size, first
+
+def encode_binary(data):
+    # binary frames for rows of u, v, w, d2, mag, az, el
+    frames = []
+    for row in np.asarray(data, dtype=float):
+        payload = BINARY_PAYLOAD.pack(*row)
+        frames.append(BINARY_SYNC+payload+bytes([sum(payload) % 256]))
+    return b''.join(frames)
+
+def encode_ascii(data):
+    # ASCII frames as sent by the anemometer
+    return ''.join(' '+' '.join('%.1f' % value for value in row)+'\r' for row in data).encode()
+
+DECODERS = {'ascii': AsciiDecoder, 'binary': BinaryDecoder}
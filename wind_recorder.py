@@ -0,0 +1,259 @@
+# coding: utf-8
+
+import logging
+import os
+import queue
+import threading
+import time
+import traceback
+from collections import deque
+import numpy as np
+from wind_binary import EXTENSION, WindBinaryWriter
+from wind_buffer import MARK_USER
+from wind_parser import FIELDS, format_records
+
+logger = logging.getLogger(__name__)
+
+HOUR_NS = 3600*10**9
+DAY_NS = 24*HOUR_NS
+ROTATIONS = ('midnight', 'hourly', 'size')
+FSYNC_POLICIES = ('never', 'flush', 'rotate')
+FILE_FORMATS = ('txt', 'afb')
+
+class WindRecorder(threading.Thread):
+    """Append the live samples to the daily files from a background thread.
+
+    No sample is ever dropped: when the queue of max_queue batches is full, write blocks
+    the acquisition until the recorder catches up. Marks never block, they name the sample
+    by its number and are applied once the recorder received it. When the folder can not be
+    written the rows are kept and tried again at every commit, and error tells why.
+    """
+
+    def __init__(self, folder, rotation='midnight', max_bytes=100*2**20,
+                 flush_interval=1.0, fsync='rotate', max_pending=8192, file_format='txt',
+                 max_queue=1024):
+        super(WindRecorder, self).__init__(daemon=True)
+        if rotation not in ROTATIONS:
+            raise ValueError(f'Unknown rotation: {rotation}')
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f'Unknown fsync policy: {fsync}')
+        if file_format not in FILE_FORMATS:
+            raise ValueError(f'Unknown file format: {file_format}')
+        self.folder = folder
+        self.rotation = rotation
+        self.max_bytes = max_bytes
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+        self.max_pending = max_pending
+        self.file_format = file_format
+        self.queue = queue.Queue(max_queue)
+        self.behind = False
+        self.file = None
+        self.file_key = None
+        self.file_name = ''
+        # samples waiting for the next group commit
+        self.pending_time = []
+        self.pending_data = []
+        self.pending_mark = []
+        self.pending_size = 0
+        self.held = None
+        # samples received so far and the marks (sample number, flag) not applied yet
+        self.received = 0
+        self.marks = deque()
+        # reason of the failing writes, None while the recording works
+        self.error = None
+
+    # called from the acquisition side
+    def write(self, times, data, marks=None):
+        times = np.asarray(times)
+        if times.dtype.kind == 'M':
+            times = times.astype('datetime64[ns]').astype(np.int64)
+        if marks is None:
+            marks = np.zeros(len(times), dtype=np.uint8)
+        # the marks are copied, they are changed by mark_sample later
+        self._put(('data', (times, np.asarray(data), np.array(marks, dtype=np.uint8))))
+
+    def mark_sample(self, number, flag=MARK_USER):
+        # mark the sample number (counted from 0 over all the writes); deque append is atomic,
+        # so this never waits for the recorder
+        self.marks.append((number, flag))
+
+    def close(self):
+        self._put(('close', None))
+        self.join()
+
+    def _put(self, item):
+        # backpressure instead of loss when the disk is slower than the acquisition
+        try:
+            self.queue.put_nowait(item)
+        except queue.Full:
+            if not self.behind:
+                logger.warning(f'Recording to {self.folder} is behind, the acquisition waits.')
+                self.behind = True
+            self.queue.put(item)
+            return
+        if self.behind:
+            logger.info(f'Recording to {self.folder} caught up.')
+            self.behind = False
+
+    # recorder thread
+    def run(self):
+        logger.info(f'Start recording to {self.folder}')
+        deadline = time.monotonic()+self.flush_interval
+        active = True
+        while active:
+            try:
+                kind, item = self.queue.get(timeout=max(deadline-time.monotonic(), 0))
+            except queue.Empty:
+                kind, item = 'flush', None
+            try:
+                if kind == 'data':
+                    self._receive(*item)
+                elif kind == 'close':
+                    active = False
+                self._apply_marks()
+                if not active or time.monotonic() >= deadline or self.pending_size >= self.max_pending:
+                    self._commit(final=not active)
+                    deadline = time.monotonic()+self.flush_interval
+            except Exception:
+                logger.error(f'{traceback.format_exc()}')
+        if self.pending_size:
+            logger.error(f'{self.pending_size} samples could not be recorded to {self.folder}.')
+        try:
+            self._close_file()
+        except OSError as e:
+            logger.error(f'Can not close {self.file_name}: {e}')
+        logger.info(f'Stop recording to {self.folder}')
+
+    def _receive(self, times, data, marks):
+        if not len(times):
+            return
+        # the newest sample is held back so that a mark can still reach it
+        if self.held is not None:
+            self._queue_rows(*self.held)
+        self.held = (times[-1:], data[-1:], marks[-1:].copy())
+        self._queue_rows(times[:-1], data[:-1], marks[:-1])
+        self.received += len(times)
+
+    def _apply_marks(self):
+        # the marks of the samples received, into the held or pending rows
+        while self.marks and self.marks[0][0] < self.received:
+            number, flag = self.marks.popleft()
+            if self.held is not None and number == self.received-1:
+                self.held[2][0] |= flag
+                continue
+            index = number-(self.received-self.pending_size-(self.held is not None))
+            if index < 0:
+                logger.warning(f'Mark of sample {number} came after it was written to {self.file_name}.')
+                continue
+            for marks in self.pending_mark:
+                if index < len(marks):
+                    marks[index] |= flag
+                    break
+                index -= len(marks)
+
+    def _queue_rows(self, times, data, marks):
+        if len(times):
+            self.pending_time.append(times)
+            self.pending_data.append(data)
+            self.pending_mark.append(marks)
+            self.pending_size += len(times)
+
+    def _commit(self, final=False):
+        if final and self.held is not None:
+            self._queue_rows(*self.held)
+            self.held = None
+        if not self.pending_size:
+            return
+        times = np.concatenate(self.pending_time)
+        data = np.concatenate(self.pending_data).reshape((-1, FIELDS))
+        marks = np.concatenate(self.pending_mark)
+        # split the block where the file changes, no copy of the day is needed; the rows stay
+        # pending until they are flushed
+        done = 0
+        try:
+            for start, end, key in self._segments(times):
+                self._open_file(key, times[start])
+                self._write_rows(times[start:end], data[start:end], marks[start:end])
+                self.file.flush()
+                done = end
+            if self.fsync == 'flush':
+                os.fsync(self.file.fileno())
+        except OSError as e:
+            self._fail(e)
+        self.pending_time = [times[done:]] if done < len(times) else []
+        self.pending_data = [data[done:]] if done < len(times) else []
+        self.pending_mark = [marks[done:]] if done < len(times) else []
+        self.pending_size = len(times)-done
+        if not self.pending_size and self.error is not None:
+            logger.info(f'Recording to {self.folder} works again.')
+            self.error = None
+
+    def _fail(self, error):
+        # the file is opened again at the next commit
+        if self.error is None:
+            logger.error(f'Can not record to {self.folder}: {error}. The samples are kept and written when it works again.')
+        self.error = str(error)
+        if self.file is not None:
+            try:
+                self.file.close()
+            except OSError:
+                pass
+            self.file = None
+
+    def _segments(self, times):
+        if self.rotation == 'midnight':
+            keys = times//DAY_NS
+        elif self.rotation == 'hourly':
+            keys = times//HOUR_NS
+        else:
+            # rotation by size happens at group commit boundaries
+            key = self.file_key
+            if self.file is None or self.file.tell() >= self.max_bytes:
+                key = times[0]
+            return [(0, len(times), key)]
+        bounds = np.flatnonzero(np.diff(keys))+1
+        starts = np.r_[0, bounds]
+        ends = np.r_[bounds, len(times)]
+        return [(s, e, keys[s]) for s, e in zip(starts, ends)]
+
+    def file_path(self, first_time):
+        stamp = np.datetime64(int(first_time), 'ns').astype('datetime64[us]').tolist()
+        if self.rotation == 'midnight':
+            name = stamp.strftime('%y%m%d')
+        elif self.rotation == 'hourly':
+            name = stamp.strftime('%y%m%d_%H0000')
+        else:
+            name = stamp.strftime('%y%m%d_%H%M%S')
+        if self.file_format == 'afb':
+            return os.path.join(self.folder, name+EXTENSION)
+        return os.path.join(self.folder, name+'.txt')
+
+    def _open_file(self, key, first_time):
+        if self.file is not None and key == self.file_key:
+            return
+        self._close_file()
+        self.file_key = key
+        self.file_name = self.file_path(first_time)
+        # append, so a restart on the same day continues the same file
+        if self.file_format == 'afb':
+            self.file = WindBinaryWriter(self.file_name)
+        else:
+            self.file = open(self.file_name, 'a')
+        logger.info(f'Record to {self.file_name}')
+
+    def _write_rows(self, times, data, marks):
+        if self.file_format == 'afb':
+            self.file.write(times, data, marks)
+            return
+        self.file.write(format_records(times.astype('datetime64[ns]'), data,
+                                       (marks & MARK_USER) != 0))
+
+    def _close_file(self):
+        if self.file is None:
+            return
+        self.file.flush()
+        if self.fsync != 'never':
+            os.fsync(self.file.fileno())
+        self.file.close()
+        self.file = None
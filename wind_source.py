@@ -0,0 +1,320 @@
+# coding: utf-8
+
+import argparse
+import math
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from urllib.parse import parse_qs, urlparse
+import numpy as np
+import serial
+from wind_parser import FIELDS, RECORD_PATTERN, parse_records
+from wind_protocol import encode_ascii, encode_binary
+
+# Data sources for load tests without an anemometer:
+#   sim://RATE[?frame=binary&sequence=1]   synthetic samples at RATE Hz
+#   replay://PATH[?speed=N]                a daily text file at N times real time
+# Both can be opened in-process as a port of the engine, or served on a
+# pseudo-terminal (Linux) so the whole serial path is exercised.
+#   follow://FOLDER                        the samples a recorder (the daemon)
+#                                          appends to the text files of FOLDER
+
+class SyntheticSource:
+    """Endless synthetic anemometer samples at a fixed rate."""
+
+    def __init__(self, rate=20.0, sequence=False, seed=None):
+        self.rate = rate
+        # with sequence the u column counts the samples, to find dropped ones
+        self.sequence = sequence
+        self.random = np.random.default_rng(seed)
+
+    def events(self, block=256):
+        # (seconds after start, u, v, w, d2, mag, az, el)
+        count = 0
+        speed, direction = 2.0, 0.0
+        while True:
+            speed = abs(speed+np.cumsum(self.random.normal(0, 0.05, block)))
+            direction = direction+np.cumsum(self.random.normal(0, 0.01, block))
+            u = speed*np.cos(direction)
+            v = speed*np.sin(direction)
+            w = self.random.normal(0, 0.2, block)
+            if self.sequence:
+                u = np.arange(count, count+block, dtype=float)
+            d2 = np.hypot(u, v)
+            mag = np.hypot(d2, w)
+            az = np.degrees(np.arctan2(v, u)) % 360
+            el = np.degrees(np.arctan2(w, d2))
+            offsets = np.arange(count, count+block)/self.rate
+            rows = np.column_stack([u, v, w, d2, mag, az, el])
+            for offset, row in zip(offsets.tolist(), rows):
+                yield offset, row
+            count += block
+            speed, direction = speed[-1], direction[-1]
+
+class ReplaySource:
+    """Samples of a daily text file, spaced by their recorded times divided by speed."""
+
+    def __init__(self, path, speed=1.0, block_lines=4096):
+        self.path = path
+        self.speed = speed
+        self.block_lines = block_lines
+
+    def events(self):
+        first = None
+        with open(self.path) as f:
+            while True:
+                lines = f.readlines(self.block_lines*70)
+                if not lines:
+                    return
+                times, data, marks, valid = parse_records(lines)
+                if not len(times):
+                    continue
+                if first is None:
+                    first = times[0]
+                offsets = (times-first)/1e9/self.speed
+                for offset, row in zip(offsets.tolist(), data):
+                    yield offset, row
+
+def make_source(url):
+    # source and frame format of a sim:// or replay:// url
+    parts = urlparse(url)
+    query = {key: values[-1] for key, values in parse_qs(parts.query).items()}
+    frame_format = query.get('frame', 'ascii')
+    if parts.scheme == 'sim':
+        source = SyntheticSource(float(parts.netloc or 20), sequence=query.get('sequence') == '1')
+    elif parts.scheme == 'replay':
+        source = ReplaySource(parts.netloc+parts.path, float(query.get('speed', 1)))
+    else:
+        raise ValueError(f'Unknown source: {url}')
+    return source, frame_format
+
+def encode(rows, frame_format):
+    if frame_format == 'binary':
+        return encode_binary(rows)
+    return encode_ascii(rows)
+
+class SourcePort:
+    """Serial-like port producing the frames of a source when they are due."""
+
+    def __init__(self, source, frame_format='ascii', timeout=2):
+        self.events = source.events()
+        self.frame_format = frame_format
+        self.timeout = timeout
+        self.start = time.monotonic()
+        self.buffer = b''
+        try:
+            self.next = next(self.events, None)
+        except OSError as e:
+            # a replayed file that can not be opened is a port that can not be opened
+            raise serial.SerialException(f'Can not open {e.filename}: {e.strerror}') from e
+
+    def _fill(self):
+        # encode every sample that is due by now
+        now = time.monotonic()-self.start
+        rows = []
+        while self.next is not None and self.next[0] <= now:
+            rows.append(self.next[1])
+            self.next = next(self.events, None)
+        if rows:
+            self.buffer += encode(rows, self.frame_format)
+
+    @property
+    def in_waiting(self):
+        self._fill()
+        return len(self.buffer)
+
+    def read(self, size=1):
+        self._fill()
+        if not self.buffer and self.next is not None:
+            # block until the next sample, like a serial read with timeout
+            wait = self.next[0]-(time.monotonic()-self.start)
+            if wait > self.timeout:
+                time.sleep(self.timeout)
+                return b''
+            time.sleep(max(wait, 0))
+            self._fill()
+        elif not self.buffer:
+            time.sleep(self.timeout)
+        data, self.buffer = self.buffer[:size], self.buffer[size:]
+        return data
+
+    def close(self):
+        self.events.close()
+
+class FollowPort:
+    """Serial-like port producing ASCII frames of the lines appended to the newest text file of a folder."""
+
+    def __init__(self, folder, timeout=2, poll_interval=0.1):
+        if not os.path.isdir(folder):
+            raise serial.SerialException(f'No such folder: {folder}')
+        self.folder = folder
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+        self.buffer = b''
+        self.partial = ''
+        self.file = None
+        self.path = self._newest()
+        if self.path is not None:
+            # only the samples written from now on
+            self.file = open(self.path)
+            self.file.seek(0, os.SEEK_END)
+
+    def _newest(self):
+        # the recorder names its files by date, so the newest sorts last
+        names = sorted(name for name in os.listdir(self.folder) if name.endswith('.txt'))
+        return os.path.join(self.folder, names[-1]) if names else None
+
+    def _read_lines(self):
+        lines = (self.partial+self.file.read()).split('\n')
+        self.partial = lines.pop()
+        return lines
+
+    def _fill(self):
+        lines = self._read_lines() if self.file is not None else []
+        newest = self._newest()
+        if newest is not None and newest != self.path:
+            # the recorder rotated: finish the old file and continue with the new one
+            if self.file is not None:
+                self.file.close()
+            self.path = newest
+            self.file = open(self.path)
+            self.partial = ''
+            lines += self._read_lines()
+        frames = [' '+' '.join(line.split(',')[1:FIELDS+1])+'\r'
+                  for line in lines if RECORD_PATTERN.fullmatch(line)]
+        if frames:
+            self.buffer += ''.join(frames).encode()
+
+    @property
+    def in_waiting(self):
+        self._fill()
+        return len(self.buffer)
+
+    def read(self, size=1):
+        self._fill()
+        deadline = time.monotonic()+self.timeout
+        while not self.buffer and time.monotonic() < deadline:
+            time.sleep(self.poll_interval)
+            self._fill()
+        data, self.buffer = self.buffer[:size], self.buffer[size:]
+        return data
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+
+def open_port(port, baudrate, timeout):
+    # serial port, pyserial url or in-process source
+    if port.startswith('follow://'):
+        parts = urlparse(port)
+        return FollowPort(parts.netloc+parts.path, timeout)
+    if port.startswith(('sim://', 'replay://')):
+        source, frame_format = make_source(port)
+        return SourcePort(source, frame_format, timeout)
+    return serial.serial_for_url(port, baudrate, timeout=timeout)
+
+class PtyDevice(threading.Thread):
+    """Pseudo-terminal that writes the frames of a source at their due time (Linux)."""
+
+    def __init__(self, source, frame_format='ascii'):
+        super(PtyDevice, self).__init__(daemon=True)
+        import pty
+        import tty
+        self.master, self.slave = pty.openpty()
+        tty.setraw(self.slave)
+        self.path = os.ttyname(self.slave)
+        self.source = source
+        self.frame_format = frame_format
+        self.active = False
+        self.sent = 0
+        self.start_time = None
+
+    def run(self):
+        self.active = True
+        self.start_time = time.monotonic()
+        for offset, row in self.source.events():
+            if not self.active:
+                break
+            wait = self.start_time+offset-time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+            try:
+                os.write(self.master, encode([row], self.frame_format))
+            except OSError:
+                break
+            self.sent += 1
+        self.active = False
+
+    def stop(self):
+        self.active = False
+        self.join()
+        os.close(self.master)
+        os.close(self.slave)
+
+def soak(rate, seconds, frame_format='ascii', late=0.5):
+    # synthetic samples through a pty into the engine, then count lost and late samples
+    from wind_engine import WindEngine
+    received = []
+    def on_batch(device, times, data, read_time):
+        received.append((time.monotonic(), data[:, 0].copy()))
+    device = PtyDevice(SyntheticSource(rate, sequence=True), frame_format)
+    folder = tempfile.mkdtemp()
+    engine = WindEngine(on_batch=on_batch)
+    engine.add_device(device.path, folder, baudrate=921600, frame_format=frame_format)
+    engine.start()
+    device.start()
+    time.sleep(seconds)
+    device.active = False
+    time.sleep(1)
+    engine.stop()
+    device.stop()
+    shutil.rmtree(folder)
+    arrival = np.concatenate([np.full(seq.size, t) for t, seq in received]) if received else np.empty(0)
+    sequence = np.concatenate([seq for t, seq in received]) if received else np.empty(0)
+    latency = arrival-(device.start_time+sequence/rate)
+    return {'sent': device.sent,
+            'received': int(np.unique(sequence).size),
+            'dropped': device.sent-int(np.unique(sequence).size),
+            'late': int(np.count_nonzero(latency > late)),
+            'latency p50 (s)': float(np.percentile(latency, 50)) if latency.size else math.nan,
+            'latency p99 (s)': float(np.percentile(latency, 99)) if latency.size else math.nan,
+            'latency max (s)': float(latency.max()) if latency.size else math.nan}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Simulated anemometer for load tests')
+    sub = parser.add_subparsers(dest='command', required=True)
+    serve = sub.add_parser('pty', help='serve samples on a pseudo-terminal')
+    serve.add_argument('--rate', type=float, default=20, help='synthetic sample rate (Hz)')
+    serve.add_argument('--replay', help='daily text file to replay instead of synthetic samples')
+    serve.add_argument('--speed', type=float, default=1, help='replay speed factor')
+    serve.add_argument('--frame', choices=('ascii', 'binary'), default='ascii')
+    test = sub.add_parser('soak', help='measure dropped and late samples')
+    test.add_argument('--rate', type=float, nargs='+', default=[10, 50, 100])
+    test.add_argument('--seconds', type=float, default=30)
+    test.add_argument('--frame', choices=('ascii', 'binary'), default='ascii')
+    args = parser.parse_args(argv)
+    if args.command == 'pty':
+        if args.replay:
+            source = ReplaySource(args.replay, args.speed)
+        else:
+            source = SyntheticSource(args.rate)
+        device = PtyDevice(source, args.frame)
+        device.start()
+        print(f'Serving on {device.path}, press Ctrl+C to stop')
+        try:
+            while device.is_alive():
+                device.join(0.5)
+        except KeyboardInterrupt:
+            pass
+        device.stop()
+    else:
+        for rate in args.rate:
+            result = soak(rate, args.seconds, args.frame)
+            print(f'{rate:g} Hz: '+', '.join(f'{key} {value:.3f}' if isinstance(value, float) else f'{key} {value}'
+                                             for key, value in result.items()))
+
+if __name__ == '__main__':
+    sys.exit(main())
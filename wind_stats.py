@@ -0,0 +1,131 @@
+# coding: utf-8
+
+import math
+import threading
+from collections import deque
+import numpy as np
+
+# sums kept per bucket: count, speed, speed squared, sine and cosine of azimuth, elevation
+COUNT, SPEED, SPEED2, SIN, COS, ELEVATION = range(6)
+
+class RollingStats:
+    """Running wind statistics over trailing windows, updated batch by batch.
+
+    Samples are summed into short time buckets. Every window keeps running totals, adding a
+    bucket when it closes and subtracting it when it leaves the window, and the 3-s gust is
+    the maximum of a sliding 3-s mean kept in a monotonic queue. A sample therefore costs the
+    same whatever the window length.
+    """
+
+    def __init__(self, windows=(60, 600), bucket=0.25, gust=3.0):
+        # window lengths in s
+        self.windows = tuple(windows)
+        self.bucket = int(bucket*1e9)
+        self.spans = [max(round(window/bucket), 1) for window in self.windows]
+        self.gust_span = max(round(gust/bucket), 1)
+        self.capacity = max(self.spans+[self.gust_span])
+        self.lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        with self.lock:
+            # closed buckets in a ring, the n-th closed bucket at n % capacity
+            self.ids = np.zeros(self.capacity, dtype=np.int64)
+            self.sums = np.zeros((self.capacity, 6))
+            self.closed = 0
+            self.open_id = None
+            self.open_sums = np.zeros(6)
+            # per window (and the gust window last): running totals and oldest bucket kept
+            self.totals = np.zeros((len(self.windows)+1, 6))
+            self.tails = [0]*(len(self.windows)+1)
+            # per window: (bucket id, 3-s mean) with decreasing means
+            self.gusts = [deque() for window in self.windows]
+
+    def add(self, times, data):
+        # times in int64 ns; data with u, v, w, d2, mag, az, el
+        if not len(times):
+            return
+        speed = data[:, 4]
+        azimuth = np.radians(data[:, 5])
+        values = np.column_stack([np.ones(len(speed)), speed, speed**2,
+                                  np.sin(azimuth), np.cos(azimuth), data[:, 6]])
+        ids = np.asarray(times, dtype=np.int64)//self.bucket
+        starts = np.r_[0, np.flatnonzero(np.diff(ids))+1]
+        sums = np.add.reduceat(values, starts, axis=0)
+        with self.lock:
+            for bucket, bucket_sums in zip(ids[starts], sums):
+                if bucket != self.open_id:
+                    self._close(bucket)
+                self.open_sums += bucket_sums
+
+    def _close(self, bucket):
+        # close the open bucket and start a new one at bucket
+        if self.open_id is not None and self.open_sums[COUNT]:
+            slot = self.closed % self.capacity
+            self.ids[slot] = self.open_id
+            self.sums[slot] = self.open_sums
+            self.closed += 1
+            self.totals += self.open_sums
+            if self.closed % self.capacity == 0:
+                self._resum()
+            gust = self.totals[-1]
+            if gust[COUNT]:
+                self._push_gust(self.open_id, gust[SPEED]/gust[COUNT])
+        self.open_id = bucket
+        self.open_sums = np.zeros(6)
+        # drop the buckets that left each window, the open bucket included in the span
+        for index, span in enumerate(self.spans+[self.gust_span]):
+            tail = self.tails[index]
+            while tail < self.closed and self.ids[tail % self.capacity] <= bucket-span:
+                self.totals[index] -= self.sums[tail % self.capacity]
+                tail += 1
+            self.tails[index] = tail
+        for gusts, span in zip(self.gusts, self.spans):
+            while gusts and gusts[0][0] <= bucket-span:
+                gusts.popleft()
+
+    def _push_gust(self, bucket, mean):
+        for gusts in self.gusts:
+            while gusts and gusts[-1][1] <= mean:
+                gusts.pop()
+            gusts.append((bucket, mean))
+
+    def _resum(self):
+        # sum the windows again now and then, so rounding errors do not pile up
+        for index in range(len(self.totals)):
+            slots = np.arange(self.tails[index], self.closed) % self.capacity
+            self.totals[index] = self.sums[slots].sum(axis=0)
+
+    def snapshot(self):
+        # statistics per window, the bucket being filled included; None without samples
+        result = {}
+        with self.lock:
+            for index, window in enumerate(self.windows):
+                sums = self.totals[index]+self.open_sums
+                count = sums[COUNT]
+                if not count:
+                    result[window] = None
+                    continue
+                mean = sums[SPEED]/count
+                std = math.sqrt(max(sums[SPEED2]/count-mean**2, 0))
+                gusts = self.gusts[index]
+                result[window] = {'samples': int(count),
+                                  'mean speed': mean,
+                                  'std': std,
+                                  'turbulence intensity': std/mean if mean else math.nan,
+                                  'gust 3 s': gusts[0][1] if gusts else math.nan,
+                                  'direction': math.degrees(math.atan2(sums[SIN], sums[COS])) % 360,
+                                  'elevation': sums[ELEVATION]/count}
+        return result
+
+def rose_counts(angles, speeds, first, width, sectors, edges):
+    # samples per angle sector and speed class, counted in one pass: sector k covers first+k*width
+    # to first+(k+1)*width degrees, the angles taken modulo 360 and the last sector closed; a class
+    # starts at its edge, the speeds beyond the last edge counting in the last class
+    angles, speeds = np.asarray(angles, dtype=float), np.asarray(speeds, dtype=float)
+    finite = np.isfinite(angles) & np.isfinite(speeds)
+    angles, speeds = angles[finite], speeds[finite]
+    classes = len(edges)-1
+    sector = np.minimum(((angles-first) % 360)//width, sectors-1).astype(np.int64)
+    speed_class = np.clip(np.searchsorted(edges, speeds, side='right')-1, 0, classes-1)
+    return np.bincount(sector*classes+speed_class, minlength=sectors*classes).reshape((sectors, classes))